@@ -17,7 +17,6 @@ from labeler_backend import get_repo
 import ui_components as ui
 from labeler_backend.bb_resolver import BackblazeResolverError  # new import
 import auth  # NEW: authentication helpers
-from taxonomy import ATTRIBUTE_RULES  # Import for attribute loading logic
 
 # Constants
 HISTORY_LIMIT = int(os.getenv("HISTORY_LIMIT", "10"))  # How many recent images to show in history
@@ -208,9 +207,10 @@ def get_cached_user_counters(repo, user_id: str, ttl_seconds: int = 30) -> dict:
 def invalidate_user_caches(user_id: str) -> None:
     """Invalidate all caches for a specific user (call after save/confirm operations)."""
     # Remove history caches for this user
-    keys_to_remove = [k for k in st.session_state.user_history_cache if k.startswith(f"{user_id}|")]
-    for k in keys_to_remove:
-        del st.session_state.user_history_cache[k]
+    history_cache = st.session_state.user_history_cache
+    prefix = f"{user_id}|"
+    for k in [k for k in history_cache if k.startswith(prefix)]:
+        del history_cache[k]
     
     # Remove counter cache for this user
     if user_id in st.session_state.user_counters_cache:
@@ -240,11 +240,7 @@ def build_complete_ui_state() -> dict:
     try:
         leaves = ui.get_leaf_locations()
         for loc in leaves:
-            if loc not in ui.FEATURE_TAXONOMY:
-                continue
-            for category in ui.FEATURE_TAXONOMY[loc]:
-                na_key = f"na_{loc}_{category}"
-                sel_key = f"sel_{loc}_{category}"
+            for _category, _feats, na_key, sel_key in ui.FEATURE_KEYS.get(loc, ()):
                 if na_key in st.session_state:
                     ui_state[na_key] = st.session_state[na_key]
                 if sel_key in st.session_state:
@@ -406,10 +402,12 @@ def main() -> None:  # noqa: C901
     if (is_admin or is_qa_editor) and admin_mode == "Label" and st.session_state.get("_last_review_user"):
         st.session_state._last_review_user = None
         st.session_state.current_task = None
-        # Reset all session state relevant to labeling UI
-        for key in list(st.session_state.keys()):
-            if key not in ("role", "username", "authenticated", "repo", "repo_mode", "admin_mode"):
-                del st.session_state[key]
+        # Reset all session state relevant to labeling UI (one snapshot of the
+        # keys through the proxy, then plain deletes)
+        ss = st.session_state
+        keep = {"role", "username", "authenticated", "repo", "repo_mode", "admin_mode"}
+        for key in [k for k in ss.keys() if k not in keep]:
+            del ss[key]
         st.rerun()
 
     # ---------------------------------------------------------------
@@ -551,8 +549,9 @@ def main() -> None:  # noqa: C901
                     for level_key, value in chain.items():
                         if level_key.startswith("level_"):
                             w_key = f"chain_{chain_index}_{level_key}"
-                            # Shadow storage for our own state handling
-                            st.session_state.widget_states[f"{w_key}_state"] = value
+                            # Shadow storage for our own state handling, keyed (chain, level)
+                            level = int(level_key[6:])
+                            st.session_state.widget_states[(chain_index, level)] = value
                             # Also prime the actual widget key so Streamlit renders the desired default
                             if st.session_state.get(w_key) != value:
                                 st.session_state[w_key] = value
@@ -591,12 +590,11 @@ def main() -> None:  # noqa: C901
                             feature_by_location_category[(location, category)].append(feature)
             else:
                 # Legacy flat format - convert to structured for processing
+                has_none = "None" in feature_list
                 for loc in ui.get_leaf_locations():
-                    if loc not in ui.FEATURE_TAXONOMY:
-                        continue
-                    for category, feats in ui.FEATURE_TAXONOMY[loc].items():
+                    for category, feats, _na_key, _sel_key in ui.FEATURE_KEYS.get(loc, ()):
                         # Check if "None" is in the feature set for this category
-                        if "None" in feature_list and "None" in feats:
+                        if has_none and "None" in feats:
                             feature_by_location_category[(loc, category)] = ["None"]
                         else:
                             # Look for actual feature selections
@@ -605,9 +603,11 @@ def main() -> None:  # noqa: C901
                                 feature_by_location_category[(loc, category)] = sel
             
             # Process the parsed features
+            # persistent_feature_state is {location: {category: {"na": bool, "sel": list}}}
             for loc in ui.get_leaf_locations():
                 if loc not in ui.FEATURE_TAXONOMY:
                     continue
+                loc_state = st.session_state.persistent_feature_state.setdefault(loc, {})
                 for category in ui.FEATURE_TAXONOMY[loc]:
                     if (loc, category) in feature_by_location_category:
                         # Features were found for this category
@@ -625,8 +625,7 @@ def main() -> None:  # noqa: C901
                         # ---------------------------------------------------------------------------
                         if not canon_options:
                             # No options defined – default to N/A
-                            st.session_state.persistent_feature_state[f"persistent_na_{loc}_{category}"] = True
-                            st.session_state.persistent_feature_state[f"persistent_sel_{loc}_{category}"] = []
+                            loc_state[category] = {"na": True, "sel": []}
                         else:
                             canon_features: list[str] = []
                             for feat in features:
@@ -644,30 +643,21 @@ def main() -> None:  # noqa: C901
                                     canon_features.append(matched)
                             # After canonicalisation, if we didn't retain any valid features, mark as N/A
                             if not canon_features:
-                                st.session_state.persistent_feature_state[f"persistent_na_{loc}_{category}"] = True
-                                st.session_state.persistent_feature_state[f"persistent_sel_{loc}_{category}"] = []
+                                loc_state[category] = {"na": True, "sel": []}
                             else:
-                                st.session_state.persistent_feature_state[f"persistent_na_{loc}_{category}"] = False
-                                st.session_state.persistent_feature_state[f"persistent_sel_{loc}_{category}"] = canon_features
+                                loc_state[category] = {"na": False, "sel": canon_features}
                     else:
                         # No features found – this category was marked as N/A
-                        st.session_state.persistent_feature_state[f"persistent_na_{loc}_{category}"] = True
-                        st.session_state.persistent_feature_state[f"persistent_sel_{loc}_{category}"] = []
+                        loc_state[category] = {"na": True, "sel": []}
 
             # Immediately reflect persistent_feature_state into current UI selection keys
             # so the first render of this image shows the correct feature selections.
             for loc in ui.get_leaf_locations():
-                if loc not in ui.FEATURE_TAXONOMY:
-                    continue
-                for category in ui.FEATURE_TAXONOMY[loc]:
-                    na_key = f"na_{loc}_{category}"
-                    sel_key = f"sel_{loc}_{category}"
-                    persistent_na_key = f"persistent_na_{loc}_{category}"
-                    persistent_sel_key = f"persistent_sel_{loc}_{category}"
-                    if persistent_na_key in st.session_state.persistent_feature_state:
-                        st.session_state[na_key] = st.session_state.persistent_feature_state[persistent_na_key]
-                    if persistent_sel_key in st.session_state.persistent_feature_state:
-                        st.session_state[sel_key] = st.session_state.persistent_feature_state[persistent_sel_key]
+                for category, _feats, na_key, sel_key in ui.FEATURE_KEYS.get(loc, ()):
+                    saved = st.session_state.persistent_feature_state.get(loc, {}).get(category)
+                    if saved is not None:
+                        st.session_state[na_key] = saved["na"]
+                        st.session_state[sel_key] = saved["sel"]
 
             # Attributes
             st.session_state.location_attributes = {}
@@ -702,15 +692,7 @@ def main() -> None:  # noqa: C901
                         if not chain or found_location:
                             continue
                         # Safely get the leaf location with proper bounds checking
-                        chain_values = list(chain.values())
-                        if not chain_values:
-                            continue
-                        if chain_values[-1] != "N/A":
-                            leaf_location = chain_values[-1]
-                        elif len(chain_values) > 1:
-                            leaf_location = chain_values[-2]
-                        else:
-                            leaf_location = None
+                        leaf_location = ui.chain_leaf_location(chain)
                         if not leaf_location:
                             continue
                         location_key = f"loc_{idx}_{leaf_location}"
@@ -727,27 +709,14 @@ def main() -> None:  # noqa: C901
                         continue
                     
                     # Safely get the leaf location with proper bounds checking
-                    chain_values = list(chain.values())
-                    if not chain_values:
-                        continue
-                    
-                    if chain_values[-1] != "N/A":
-                        leaf_location = chain_values[-1]
-                    elif len(chain_values) > 1:
-                        leaf_location = chain_values[-2]
-                    else:
-                        leaf_location = None
-                    
+                    leaf_location = ui.chain_leaf_location(chain)
                     if not leaf_location:
                         continue
                     
                     location_key = f"loc_{idx}_{leaf_location}"
                     
                     # Find relevant attributes for this location
-                    relevant = set()
-                    for attr, locs in ATTRIBUTE_RULES.items():
-                        if any(loc in step for step in chain for loc in locs):
-                            relevant.add(attr)
+                    relevant = ui.get_relevant_attributes([list(chain.values())])
                     
                     # For each relevant attribute, if it's not in the database, set it to "N/A"
                     for attr in relevant:
@@ -757,9 +726,11 @@ def main() -> None:  # noqa: C901
             # Populate persistent_attribute_state from loaded location_attributes
             # This is needed for the restore_attribute_state() function to work properly
             for location_key, attrs in st.session_state.location_attributes.items():
+                parsed = ui.parse_location_key(location_key)
+                if parsed is None:
+                    continue
                 for attr, value in attrs.items():
-                    persistent_key = f"persistent_{location_key}_{attr}"
-                    st.session_state.persistent_attribute_state[persistent_key] = value
+                    st.session_state.persistent_attribute_state[(*parsed, attr)] = value
 
             # Immediately restore attribute selections into the live UI state so
             # they appear on the first render for this image.
@@ -1384,20 +1355,13 @@ def main() -> None:  # noqa: C901
     if leaves and last_restored != task["image_id"]:
         # Restore feature state when locations are available
         for loc in leaves:
-            if loc not in ui.FEATURE_TAXONOMY:
-                continue
-            for category in ui.FEATURE_TAXONOMY[loc]:
-                na_key = f"na_{loc}_{category}"
-                sel_key = f"sel_{loc}_{category}"
-                
+            for category, _feats, na_key, sel_key in ui.FEATURE_KEYS.get(loc, ()):
                 # Always restore from persistent storage to ensure we have the correct state for this image
-                persistent_na_key = f"persistent_na_{loc}_{category}"
-                persistent_sel_key = f"persistent_sel_{loc}_{category}"
+                saved = st.session_state.persistent_feature_state.get(loc, {}).get(category)
                 
-                if persistent_na_key in st.session_state.persistent_feature_state:
-                    st.session_state[na_key] = st.session_state.persistent_feature_state[persistent_na_key]
-                if persistent_sel_key in st.session_state.persistent_feature_state:
-                    st.session_state[sel_key] = st.session_state.persistent_feature_state[persistent_sel_key]
+                if saved is not None:
+                    st.session_state[na_key] = saved["na"]
+                    st.session_state[sel_key] = saved["sel"]
 
         # Mark restoration done for this image
         st.session_state._features_restored_image = task["image_id"]
@@ -1545,23 +1509,19 @@ def main() -> None:  # noqa: C901
         feats_by_loc = {}
         for loc in sorted(leaves):
             feats = []
-            if loc in ui.FEATURE_TAXONOMY:
-                for category in ui.FEATURE_TAXONOMY[loc]:
-                    sel_key = f"sel_{loc}_{category}"
-                    na_key = f"na_{loc}_{category}"
-                    
-                    # Get current state
-                    selections = st.session_state.get(sel_key, [])
-                    is_na = st.session_state.get(na_key, False)
-                    
-                    # If N/A is checked, don't show any features for this category
-                    if not is_na:
-                        # Add category context to features for better display
-                        for feature in selections:
-                            if feature == "None":
-                                feats.append(f"{category}: None")
-                            else:
-                                feats.append(f"{category}: {feature}")
+            for category, _feats, na_key, sel_key in ui.FEATURE_KEYS.get(loc, ()):
+                # Get current state
+                selections = st.session_state.get(sel_key, [])
+                is_na = st.session_state.get(na_key, False)
+                
+                # If N/A is checked, don't show any features for this category
+                if not is_na:
+                    # Add category context to features for better display
+                    for feature in selections:
+                        if feature == "None":
+                            feats.append(f"{category}: None")
+                        else:
+                            feats.append(f"{category}: {feature}")
             feats_by_loc[loc] = feats
 
         # Improved 4-column layout: Locations | Features | Attributes | Condition Scores
@@ -1637,10 +1597,10 @@ def main() -> None:  # noqa: C901
                 for location_key, attrs in st.session_state.location_attributes.items():
                     if not attrs:
                         continue
-                    loc_parts = location_key.split('_', 2)
-                    if len(loc_parts) < 3:
+                    parsed = ui.parse_location_key(location_key)
+                    if parsed is None:
                         continue
-                    location_name = loc_parts[2]
+                    location_name = parsed[1]
 
                     for attr, value in attrs.items():
                         if value:
@@ -2099,23 +2059,19 @@ def main() -> None:  # noqa: C901
         feats_by_loc = {}
         for loc in sorted(leaves):
             feats = []
-            if loc in ui.FEATURE_TAXONOMY:
-                for category in ui.FEATURE_TAXONOMY[loc]:
-                    sel_key = f"sel_{loc}_{category}"
-                    na_key = f"na_{loc}_{category}"
-                    
-                    # Get current state
-                    selections = st.session_state.get(sel_key, [])
-                    is_na = st.session_state.get(na_key, False)
-                    
-                    # If N/A is checked, don't show any features for this category
-                    if not is_na:
-                        # Add category context to features for better display
-                        for feature in selections:
-                            if feature == "None":
-                                feats.append(f"{category}: None")
-                            else:
-                                feats.append(f"{category}: {feature}")
+            for category, _feats, na_key, sel_key in ui.FEATURE_KEYS.get(loc, ()):
+                # Get current state
+                selections = st.session_state.get(sel_key, [])
+                is_na = st.session_state.get(na_key, False)
+                
+                # If N/A is checked, don't show any features for this category
+                if not is_na:
+                    # Add category context to features for better display
+                    for feature in selections:
+                        if feature == "None":
+                            feats.append(f"{category}: None")
+                        else:
+                            feats.append(f"{category}: {feature}")
             feats_by_loc[loc] = feats
 
         groups = list(feats_by_loc.items())
@@ -2203,10 +2159,10 @@ def main() -> None:  # noqa: C901
                             for location_key, attrs in st.session_state.location_attributes.items():
                                 if not attrs:
                                     continue
-                                loc_parts = location_key.split('_', 2)
-                                if len(loc_parts) < 3:
+                                parsed = ui.parse_location_key(location_key)
+                                if parsed is None:
                                     continue
-                                location_name = loc_parts[2]
+                                location_name = parsed[1]
 
                                 for attr, value in attrs.items():
                                     if value:
@@ -2552,47 +2508,13 @@ def _build_payload() -> dict:
     spatial_list = ui.chains_to_label_strings()
 
     # --- feature labels ---
-    feature_list: list[str] = []
-    leaves = ui.get_leaf_locations()
-    for loc in leaves:
-        if loc not in ui.FEATURE_TAXONOMY:
-            continue
-        for category in ui.FEATURE_TAXONOMY[loc]:
-            sel_key = f"sel_{loc}_{category}"
-            na_key = f"na_{loc}_{category}"
-            
-            # Get current state
-            selections = st.session_state.get(sel_key, [])  # type: ignore[arg-type]
-            is_na = st.session_state.get(na_key, False)
-            
-            # ------------------------------------------------------------------
-            # Payload logic
-            # ------------------------------------------------------------------
-            # If BOTH N/A **and** actual selections somehow co-exist (which can
-            # happen if a user unchecked the N/A box and immediately picked
-            # a feature in the same rerun cycle), we will **prioritise the
-            # selections**.  This safeguards against an inconsistent state
-            # where nothing gets saved even though the UI visibly shows
-            # features selected.
-
-            # Treat this category as N/A **only** when there are *no* feature
-            # selections.
-            if is_na and not selections:
-                # Skip saving anything for this category (stored implicitly as N/A)
-                continue
-
-            # From here on we have at least one concrete selection OR we want to
-            # store an explicit "None" value for empty categories that support it.
-
-            # If no selections are made and "None" is available as an option,
-            # save "None" so downstream QA tools can distinguish between
-            # deliberate "None" and an unfinished category.
-            if not selections and "None" in ui.FEATURE_TAXONOMY[loc][category]:
-                feature_list.append(f"{loc}:{category}:None")
-            else:
-                # Save the actual selections with location and category context
-                for feature in selections:
-                    feature_list.append(f"{loc}:{category}:{feature}")
+    # Sorted "Location:Category:Feature" strings.  A category marked N/A with
+    # no selections is stored implicitly (omitted); selections win if both
+    # co-exist; an empty category that offers "None" is saved as "None" so
+    # downstream QA tools can tell it apart from an unfinished one.  The list
+    # is maintained incrementally across saves, so only edited categories are
+    # re-formatted and nothing is re-sorted here.
+    feature_list = ui.get_feature_labels()
 
     # --- contextual attributes ---
     attributes_map: dict[str, str] = {}
@@ -2641,7 +2563,7 @@ def _build_payload() -> dict:
         "schema_version": 1,
         "labeled_by": st.session_state.get("username", ""),
         "spatial_labels": spatial_list,  # list[str]
-        "feature_labels": sorted(feature_list),  # list[str] with format "Location:Category:Feature"
+        "feature_labels": feature_list,  # list[str] with format "Location:Category:Feature", sorted
         "attributes": attributes_map,
         "condition_scores": condition_scores,
     }
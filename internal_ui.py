@@ -5,12 +5,97 @@ This lets `app.py` use the full widget suite without importing the old
 legacy_app module.
 """
 
+import re
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
+from bisect import bisect_left, insort
 from datetime import datetime
-from typing import Dict, List, Set
+from functools import lru_cache
+from typing import Dict, List, Set, Tuple
 import pandas as pd
 
-from taxonomy import LOCATION_TAXONOMY, FEATURE_TAXONOMY, ATTRIBUTE_RULES
+from taxonomy import LOCATION_TAXONOMY, FEATURE_TAXONOMY, ATTRIBUTE_RULES, LOC_TO_ATTRS
+
+# Display order for contextual attributes; ATTRIBUTE_RULES is static, so sort once.
+_ATTR_DISPLAY_ORDER: tuple[str, ...] = tuple(sorted(ATTRIBUTE_RULES))
+
+# Attribute options are static as well.  Per displayed attribute keep its
+# label and selectbox choices (blank first, then N/A, then the options).
+_ATTR_MAP: Dict[str, list] = LOCATION_TAXONOMY.get("attributes", {})
+_ATTR_WIDGETS: Dict[str, Tuple[str, list]] = {
+    attr: (attr.replace("_", " ").title(), ["", "N/A"] + list(_ATTR_MAP.get(attr, [])))
+    for attr in _ATTR_DISPLAY_ORDER
+}
+
+
+# location_attributes keys look like loc_{chain}_{leaf} and are parsed on
+# cleanup.  Selector widgets (chain_{chain}_level_{level}) are probed by
+# building their keys, and widget_states (chain, level) and
+# persistent_attribute_state (chain, leaf, attr) are keyed by tuples, so
+# neither needs parsing.
+@lru_cache(maxsize=1024)
+def parse_location_key(key: str) -> Tuple[int, str] | None:
+    """``(chain_idx, leaf)`` of a ``loc_{chain}_{leaf}`` key, or None if malformed.
+
+    Finds the one underscore that matters instead of splitting the key, and
+    is memoised since the same few keys are parsed on every cleanup.
+    """
+    if not key.startswith("loc_"):
+        return None
+    end = key.find("_", 4)
+    if end < 0 or not key[4:end].isdecimal():
+        return None
+    return int(key[4:end]), key[end + 1:]
+
+
+def _shift_chain_keys(d: Dict, removed_index: int) -> Dict:
+    """Return *d* (keyed ``loc_{chain}_{leaf}``) with chain indices above
+    *removed_index* shifted down by one.
+
+    Keys at or below *removed_index* are kept as-is; a shifted key wins if it
+    lands on an existing one.
+    """
+    kept, shifted = {}, {}
+    for key, value in d.items():
+        parsed = parse_location_key(key)
+        if parsed and parsed[0] > removed_index:
+            shifted[_loc_attr_key(parsed[0] - 1, parsed[1])] = value
+        else:
+            kept[key] = value
+    kept.update(shifted)
+    return kept
+
+
+def _shift_tuple_keys(d: Dict, removed_index: int) -> Dict:
+    """Counterpart of :func:`_shift_chain_keys` for keys shaped ``(chain, ...)``."""
+    kept, shifted = {}, {}
+    for key, value in d.items():
+        if key[0] > removed_index:
+            shifted[(key[0] - 1, *key[1:])] = value
+        else:
+            kept[key] = value
+    kept.update(shifted)
+    return kept
+
+
+def _prune_chain_keys(d: Dict, chain_count: int) -> None:
+    """Delete, in place, entries of *d* that belong to a chain index at or past
+    *chain_count*.
+
+    Handles both key shapes: ``(chain, ...)`` tuples and ``loc_{chain}_{leaf}``
+    strings (malformed ``loc_`` keys are dropped too).  Other keys are kept.
+    """
+    stale = []
+    for key in d:
+        if isinstance(key, tuple):
+            if key[0] >= chain_count:
+                stale.append(key)
+        elif key.startswith("loc_"):
+            parsed = parse_location_key(key)
+            if parsed is None or parsed[0] >= chain_count:
+                stale.append(key)
+    for key in stale:
+        del d[key]
 
 # -----------------------------------------------------  ------------------------
 # Session-state init / reset (verbatim from legacy_app)
@@ -67,14 +152,12 @@ def init_session_state() -> None:
 
 
 def reset_session_state_to_defaults() -> None:  # shortened: same as legacy
-    # Purge any per-category feature keys from previous images
-    for key in list(st.session_state.keys()):
-        if key.startswith(("na_", "sel_")):
-            st.session_state.pop(key, None)
-        # Also clear any persisted widget values for spatial chain selectors so
-        # defaults from loaded chains take effect on the next render
-        if key.startswith("chain_"):
-            st.session_state.pop(key, None)
+    # Purge any per-category feature keys from previous images, and any
+    # persisted widget values for spatial chain selectors so defaults from
+    # loaded chains take effect on the next render
+    ss = st.session_state
+    for key in [k for k in ss.keys() if k.startswith(("na_", "sel_", "chain_"))]:
+        del ss[key]
 
     st.session_state.location_chains = [{}]
     st.session_state.feature_labels = set()
@@ -84,7 +167,7 @@ def reset_session_state_to_defaults() -> None:  # shortened: same as legacy
     st.session_state.widget_states = {}
     st.session_state.location_attributes = {}
     st.session_state.attribute_labels = {
-        k: None for k in LOCATION_TAXONOMY.get("attributes", {}).keys()
+        k: None for k in _ATTR_MAP
     }
     st.session_state.notes = ""
     st.session_state.flagged = False
@@ -107,7 +190,31 @@ def reset_session_state_to_defaults() -> None:  # shortened: same as legacy
 # Utility helpers (get_children_options, is_leaf_node, etc.)
 # -----------------------------------------------------------------------------
 
+def _index_paths(taxonomy_dict: Dict) -> Dict[Tuple[str, ...], object]:
+    """Flatten a nested taxonomy into ``{path_tuple: node}`` (root is ``()``)."""
+    index: Dict[Tuple[str, ...], object] = {(): taxonomy_dict}
+    stack = [((), taxonomy_dict)]
+    while stack:
+        prefix, node = stack.pop()
+        for key, child in node.items():
+            index[prefix + (key,)] = child
+            if isinstance(child, dict):
+                stack.append((prefix + (key,), child))
+    return index
+
+
+# The spatial taxonomy is static and walked for every level of every chain on
+# each rerun, so resolve paths through a precomputed index instead.
+_SPATIAL = LOCATION_TAXONOMY["spatial"]
+_SPATIAL_PATHS = _index_paths(_SPATIAL)
+_SPATIAL_DEPTH = max(map(len, _SPATIAL_PATHS))
+_MISSING = object()
+
+
 def get_children_options(taxonomy_dict: Dict, path: List[str]) -> List[str]:
+    if taxonomy_dict is _SPATIAL:
+        node = _SPATIAL_PATHS.get(tuple(path))
+        return list(node.keys()) if isinstance(node, dict) else []
     current = taxonomy_dict
     for step in path:
         if isinstance(current, dict) and step in current:
@@ -118,6 +225,9 @@ def get_children_options(taxonomy_dict: Dict, path: List[str]) -> List[str]:
 
 
 def is_leaf_node(taxonomy_dict: Dict, path: List[str]) -> bool:
+    if taxonomy_dict is _SPATIAL:
+        node = _SPATIAL_PATHS.get(tuple(path), _MISSING)
+        return node is _MISSING or not isinstance(node, dict) or not node
     current = taxonomy_dict
     for step in path:
         if isinstance(current, dict) and step in current:
@@ -127,57 +237,218 @@ def is_leaf_node(taxonomy_dict: Dict, path: List[str]) -> bool:
     return not isinstance(current, dict) or not current
 
 
+# FEATURE_TAXONOMY is static, so the per-location category list and the
+# session-state keys derived from it are built once and reused on every rerun.
+# Row layout: (category, feats, na_key, sel_key)
+_FEAT_ITEMS_CACHE: Dict[str, tuple] = {}
+
+
+def _feature_rows(location: str) -> tuple:
+    rows = _FEAT_ITEMS_CACHE.get(location)
+    if rows is None:
+        rows = tuple(
+            (
+                category,
+                feats,
+                f"na_{location}_{category}",
+                f"sel_{location}_{category}",
+            )
+            for category, feats in FEATURE_TAXONOMY.get(location, {}).items()
+        )
+        _FEAT_ITEMS_CACHE[location] = rows
+    return rows
+
+
+# Build the rows for every taxonomy location up front
+for _loc in FEATURE_TAXONOMY:
+    _feature_rows(_loc)
+del _loc
+
+# Public view of the prebuilt rows for app.py: {location: ((category, feats, na_key, sel_key), ...)}
+FEATURE_KEYS: Dict[str, tuple] = {loc: _FEAT_ITEMS_CACHE[loc] for loc in FEATURE_TAXONOMY}
+
+
+# Whether a category offers a "None" option; used when saving an empty selection.
+_HAS_NONE: Dict[Tuple[str, str], bool] = {
+    (loc, category): "None" in feats
+    for loc, categories in FEATURE_TAXONOMY.items()
+    for category, feats in categories.items()
+}
+
+
+@lru_cache(maxsize=8)
+def _feature_keys(leaves: Tuple[str, ...]) -> Tuple[Tuple[str, str, str, str], ...]:
+    """Flattened ``(loc, category, na_key, sel_key)`` rows for a set of leaves.
+
+    Callers pass ``_sorted_leaf_locations()`` so the same leaf set always hits the
+    same cache entry.
+    """
+    return tuple(
+        (loc, category, na_key, sel_key)
+        for loc in leaves
+        for category, _feats, na_key, sel_key in _feature_rows(loc)
+    )
+
+
+# Both helpers below are called several times per rerun (validation, save,
+# rendering).  Their results depend only on the chain paths, so they are
+# memoised on the tuple of paths; the chains are edited in place from many
+# places, so the paths themselves act as the version key.
+@lru_cache(maxsize=1024)
+def _is_complete_path(path: Tuple[str, ...]) -> bool:
+    """Per-path completeness, so editing one chain only re-checks that chain."""
+    return bool(path) and (path[-1] == "N/A" or is_leaf_node(LOCATION_TAXONOMY["spatial"], list(path)))
+
+
+@lru_cache(maxsize=16)
+def _complete_paths(paths: Tuple[Tuple[str, ...], ...]) -> Tuple[Tuple[str, ...], ...]:
+    return tuple(path for path in paths if _is_complete_path(path))
+
+
+@lru_cache(maxsize=16)
+def _leaf_locations_for(complete: Tuple[Tuple[str, ...], ...]) -> frozenset:
+    # A trailing "N/A" resolves to its parent; only feature locations count
+    return frozenset(
+        loc
+        for loc in (path[-2] if path[-1] == "N/A" and len(path) > 1 else path[-1] for path in complete)
+        if loc in FEATURE_TAXONOMY
+    )
+
+
+def _chain_paths() -> Tuple[Tuple[str, ...], ...]:
+    return tuple(tuple(chain.values()) for chain in st.session_state.location_chains)  # type: ignore[attr-defined]
+
+
+def chain_leaf_location(chain: Dict[str, str]) -> str | None:
+    """Leaf location of a chain dict; a trailing "N/A" resolves to its parent.
+
+    Reads the last one or two values through ``reversed()`` instead of
+    materialising ``list(chain.values())``.
+    """
+    values = reversed(chain.values())
+    last = next(values, None)
+    if last != "N/A":
+        return last
+    return next(values, None)
+
+
 def get_complete_chains() -> List[List[str]]:
-    complete: List[List[str]] = []
-    for chain in st.session_state.location_chains:  # type: ignore[attr-defined]
-        if chain:
-            path = list(chain.values())
-            if path[-1] == "N/A" or is_leaf_node(LOCATION_TAXONOMY["spatial"], path):
-                complete.append(path)
-    return complete
+    return [list(path) for path in _complete_paths(_chain_paths())]
+
+
+def get_complete_chain_leaves(complete: List[List[str]] | None = None) -> List[Tuple[int, str, List[str]]]:
+    """Return ``(chain_idx, leaf_location, path)`` for each complete chain.
+
+    *chain_idx* is the position within the complete chains (the index used by
+    ``loc_{chain_idx}_{leaf}`` attribute keys).  A trailing "N/A" resolves to
+    its parent; chains without a usable leaf are skipped.
+    """
+    if complete is None:
+        complete = get_complete_chains()
+    out: List[Tuple[int, str, List[str]]] = []
+    for chain_idx, path in enumerate(complete):
+        if not path:
+            continue
+        if path[-1] != "N/A":
+            leaf_location = path[-1]
+        elif len(path) > 1:
+            leaf_location = path[-2]
+        else:
+            continue
+        if leaf_location:
+            out.append((chain_idx, leaf_location, path))
+    return out
+
+
+@lru_cache(maxsize=1024)
+def _loc_attr_key(chain_idx: int, leaf_location: str) -> str:
+    return f"loc_{chain_idx}_{leaf_location}"
+
+
+def _first_location(complete: List[List[str]] | None = None) -> Tuple[int, str] | None:
+    """``(chain_idx, leaf)`` of the single attribute set per image."""
+    leaves = get_complete_chain_leaves(complete)
+    if not leaves:
+        return None
+    chain_idx, leaf_location, _ = leaves[0]
+    return chain_idx, leaf_location
+
+
+def _first_location_key(complete: List[List[str]] | None = None) -> str | None:
+    """Key of the single attribute set per image, e.g. ``loc_0_Kitchen``."""
+    first = _first_location(complete)
+    return _loc_attr_key(*first) if first else None
+
+
+def get_relevant_attributes(complete: List[List[str]]) -> Set[str]:
+    """Union of the attributes that apply to any step of the given chain paths.
+
+    Steps are matched exactly against the ATTRIBUTE_RULES locations, so e.g.
+    "Commercial Kitchen" does not pick up the "Kitchen" attributes.
+    """
+    return set().union(*(LOC_TO_ATTRS.get(step, ()) for chain in complete for step in chain))
 
 
 def get_leaf_locations() -> Set[str]:
-    leaves = set()
-    for path in get_complete_chains():
-        if path:
-            if path[-1] == "N/A" and len(path) > 1 and path[-2] in FEATURE_TAXONOMY:
-                leaves.add(path[-2])
-            elif path[-1] in FEATURE_TAXONOMY:
-                leaves.add(path[-1])
-    return leaves
+    return set(_leaf_locations_for(_complete_paths(_chain_paths())))
 
 
-def chains_to_label_strings() -> List[str]:
+@lru_cache(maxsize=16)
+def _sorted_leaves(leaves: frozenset) -> Tuple[str, ...]:
+    return tuple(sorted(leaves))
+
+
+def _sorted_leaf_locations() -> Tuple[str, ...]:
+    """Leaf locations in display order; sorted once per distinct leaf set."""
+    return _sorted_leaves(_leaf_locations_for(_complete_paths(_chain_paths())))
+
+
+@lru_cache(maxsize=16)
+def _label_strings_for(paths: Tuple[Tuple[str, ...], ...]) -> Tuple[str, ...]:
     labels: List[str] = []
-    for chain in st.session_state.location_chains:  # type: ignore[attr-defined]
-        path = list(chain.values())
+    for path in paths:
         if path and path[-1] == "N/A":
             path = path[:-1]
-        if not path:
-            continue
-        for i in range(1, len(path) + 1):
-            labels.append(" > ".join(path[:i]))
-    return labels
+        acc = ""
+        for step in path:
+            # Extend the previous prefix instead of re-joining path[:i]
+            acc = f"{acc} > {step}" if acc else step
+            labels.append(acc)
+    return tuple(labels)
+
+
+def chains_to_label_strings() -> List[str]:
+    return list(_label_strings_for(_chain_paths()))
 
 
 def label_strings_to_chains(label_strings: List[str]) -> List[Dict]:
+    # Fresh dicts on every call: the chains are edited in place once loaded.
+    chains = [dict(items) for items in _chains_for_labels(tuple(label_strings))]
+    return chains if chains else [{}]
+
+
+@lru_cache(maxsize=64)
+def _chains_for_labels(label_strings: Tuple[str, ...]) -> Tuple[Tuple[Tuple[str, str], ...], ...]:
+    """Chain items for each complete label path; memoised per label tuple."""
     def _norm(txt: str) -> str:
         # Normalise aggressively for robust matching against taxonomy keys
         # - lower-case, remove punctuation, dashes/underscores/spaces → nothing
-        import re
         s = txt.strip().lower()
         s = re.sub(r"[^a-z0-9]", "", s)  # keep alphanumerics only
         return s
 
     chains = []
     complete_paths = []
+    # A label is complete unless another label extends it.  Labels sharing a
+    # prefix sort together, so one bisect finds any extension.
+    ordered = sorted(label_strings)
     for s in label_strings:
         if not s.strip():
             continue
-        parts = s.split(" > ")
-        if all(not other.startswith(s + " > ") for other in label_strings):
-            complete_paths.append(parts)
+        prefix = s + " > "
+        i = bisect_left(ordered, prefix)
+        if i == len(ordered) or not ordered[i].startswith(prefix):
+            complete_paths.append(s.split(" > "))
 
     for parts in complete_paths:
         chain = {}
@@ -209,8 +480,8 @@ def label_strings_to_chains(label_strings: List[str]) -> List[Dict]:
         # If the final node is not a leaf, append an explicit N/A sentinel
         if not is_leaf_node(LOCATION_TAXONOMY["spatial"], canonical_path):
             chain[f"level_{len(parts)}"] = "N/A"
-        chains.append(chain)
-    return chains if chains else [{}]
+        chains.append(tuple(chain.items()))
+    return tuple(chains)
 
 def cleanup_feature_state_for_path(old_path: List[str]):
     """Clean up feature state for a specific path and all its sub-paths that's being changed"""
@@ -218,22 +489,18 @@ def cleanup_feature_state_for_path(old_path: List[str]):
         return
     
     # Clean up features for all possible leaf locations in the old path
-    for i in range(len(old_path)):
-        potential_leaf = old_path[i]
-        if potential_leaf != "N/A" and potential_leaf in FEATURE_TAXONOMY:
-            for category in FEATURE_TAXONOMY[potential_leaf]:
-                na_key = f"na_{potential_leaf}_{category}"
-                sel_key = f"sel_{potential_leaf}_{category}"
-                persistent_na_key = f"persistent_na_{potential_leaf}_{category}"
-                persistent_sel_key = f"persistent_sel_{potential_leaf}_{category}"
-                
-                # Clear from session state
-                st.session_state.pop(na_key, None)
-                st.session_state.pop(sel_key, None)
-                
-                # Clear from persistent state
-                st.session_state.persistent_feature_state.pop(persistent_na_key, None)
-                st.session_state.persistent_feature_state.pop(persistent_sel_key, None)
+    leaves = [loc for loc in old_path if loc != "N/A"]
+    
+    # Clear from session state - only keys that are actually present, so a
+    # cold path costs one membership test per key and no failed pops
+    ss = st.session_state
+    for key in [key for loc in leaves for row in _feature_rows(loc) for key in row[2:] if key in ss]:
+        del ss[key]
+    
+    # Clear from persistent state
+    persistent = st.session_state.persistent_feature_state
+    for loc in leaves:
+        persistent.pop(loc, None)
 
 def cleanup_feature_state_for_chain(chain_index: int):
     """Clean up feature state when a chain is removed"""
@@ -245,24 +512,22 @@ def cleanup_feature_state_for_chain(chain_index: int):
     
     # Also clean up any persistent state that might be associated with this chain index
     # This is a more aggressive cleanup to prevent data reappearing
-    keys_to_remove = []
-    for key in list(st.session_state.persistent_feature_state.keys()):
-        # Check if this key could be associated with the removed chain
-        # We need to be careful here since location names might reappear
-        if key.startswith(('persistent_na_', 'persistent_sel_')):
-            # Extract location name from the key
-            key_parts = key.split('_', 3)  # ['persistent', 'na/sel', 'location', 'category']
-            if len(key_parts) >= 3:
-                location_name = key_parts[2]
-                # Check if this location was part of the removed chain
-                if chain_index < len(st.session_state.location_chains):
-                    chain = st.session_state.location_chains[chain_index]
-                    old_path = list(chain.values()) if chain else []
-                    if location_name in old_path:
-                        keys_to_remove.append(key)
+    if chain_index < len(st.session_state.location_chains):
+        chain = st.session_state.location_chains[chain_index]
+        persistent = st.session_state.persistent_feature_state
+        for location_name in (chain.values() if chain else ()):
+            persistent.pop(location_name, None)
+
+def _drop_chain_attribute_state(chain_index: int) -> None:
+    """Remove ``loc_{chain_index}_*`` entries from the live and persistent attribute dicts."""
+    prefix = f"loc_{chain_index}_"
+    attrs = st.session_state.location_attributes
+    for key in [k for k in attrs if k.startswith(prefix)]:
+        del attrs[key]
     
-    for key in keys_to_remove:
-        st.session_state.persistent_feature_state.pop(key, None)
+    persistent = st.session_state.persistent_attribute_state
+    for key in [k for k in persistent if k[0] == chain_index]:
+        del persistent[key]
 
 def cleanup_attribute_state_for_path(old_path: List[str], chain_index: int):
     """Clean up attribute state for a specific path that's being changed"""
@@ -270,346 +535,260 @@ def cleanup_attribute_state_for_path(old_path: List[str], chain_index: int):
         return
     
     # Clean up attributes for the specific chain being modified
-    keys_to_remove = []
-    for location_key in list(st.session_state.location_attributes.keys()):
-        if location_key.startswith(f"loc_{chain_index}_"):
-            keys_to_remove.append(location_key)
-    
-    for key in keys_to_remove:
-        del st.session_state.location_attributes[key]
-    
-    # Also clean up persistent attribute state
-    persistent_keys_to_remove = []
-    for key in list(st.session_state.persistent_attribute_state.keys()):
-        if key.startswith(f"persistent_loc_{chain_index}_"):
-            persistent_keys_to_remove.append(key)
-    
-    for key in persistent_keys_to_remove:
-        del st.session_state.persistent_attribute_state[key]
+    _drop_chain_attribute_state(chain_index)
 
 def cleanup_attribute_state_for_chain(chain_index: int):
     """Clean up attribute state when a chain is removed"""
     # Clean up attributes for the specific chain being removed
-    keys_to_remove = []
-    for location_key in list(st.session_state.location_attributes.keys()):
-        if location_key.startswith(f"loc_{chain_index}_"):
-            keys_to_remove.append(location_key)
-    
-    for key in keys_to_remove:
-        del st.session_state.location_attributes[key]
-    
-    # Also clean up persistent attribute state
-    persistent_keys_to_remove = []
-    for key in list(st.session_state.persistent_attribute_state.keys()):
-        if key.startswith(f"persistent_loc_{chain_index}_"):
-            persistent_keys_to_remove.append(key)
-    
-    for key in persistent_keys_to_remove:
-        del st.session_state.persistent_attribute_state[key]
+    _drop_chain_attribute_state(chain_index)
     
     # Also clean up any widget states for this chain
-    widget_keys_to_remove = []
-    for key in list(st.session_state.widget_states.keys()):
-        if key.startswith(f"chain_{chain_index}_"):
-            widget_keys_to_remove.append(key)
-    
-    for key in widget_keys_to_remove:
-        del st.session_state.widget_states[key]
+    widget_states = st.session_state.widget_states
+    for key in [k for k in widget_states if k[0] == chain_index]:
+        del widget_states[key]
 
 
 
+def _mark_feature_dirty(location: str, category: str) -> None:
+    """Widget callback: remember that a feature cell changed since the last save."""
+    dirty = st.session_state.get("_feat_dirty")
+    if dirty is None:
+        dirty = st.session_state._feat_dirty = set()
+    dirty.add((location, category))
+
+
 def save_feature_state():
     """Save current feature selections to persistent storage"""
     leaves = get_leaf_locations()
     
-    # Only save state for currently valid leaf locations
-    current_valid_keys = set()
+    # persistent_feature_state is {location: {category: {"na": bool, "sel": list}}}
+    persistent = st.session_state.persistent_feature_state
     
-    for loc in leaves:
-        if loc not in FEATURE_TAXONOMY:
-            continue
-        for category in FEATURE_TAXONOMY[loc]:
-            na_key = f"na_{loc}_{category}"
-            sel_key = f"sel_{loc}_{category}"
-            persistent_na_key = f"persistent_na_{loc}_{category}"
-            persistent_sel_key = f"persistent_sel_{loc}_{category}"
-            
-            current_valid_keys.add(persistent_na_key)
-            current_valid_keys.add(persistent_sel_key)
-            
+    # Same leaves and same persistent dict as the last full save: only the
+    # cells touched by a widget since then can differ.  The path/chain
+    # cleanups pop leaves from the dict in place, so every leaf must still
+    # be present too, or the full save below has to rebuild it.
+    leaves_key = _sorted_leaf_locations()
+    dirty = st.session_state.get("_feat_dirty", set())
+    saved_for = st.session_state.get("_feat_saved_for")
+    if (
+        saved_for is not None
+        and saved_for[0] == leaves_key
+        and saved_for[1] is persistent
+        and all(loc in persistent for loc in leaves_key if loc in FEATURE_TAXONOMY)
+    ):
+        for loc, category in dirty:
+            if loc in persistent and category in FEATURE_TAXONOMY.get(loc, {}):
+                persistent[loc][category] = {
+                    "na": st.session_state.get(f"na_{loc}_{category}", False),
+                    "sel": st.session_state.get(f"sel_{loc}_{category}", []),
+                }
+        dirty.clear()
+        return
+    
+    # Only save state for currently valid leaf locations
+    valid = {loc for loc in leaves if loc in FEATURE_TAXONOMY}
+    for loc in valid:
+        saved = persistent[loc] = {}
+        for category, _feats, na_key, sel_key in _feature_rows(loc):
             # Save current session state values
-            st.session_state.persistent_feature_state[persistent_na_key] = st.session_state.get(na_key, False)
-            st.session_state.persistent_feature_state[persistent_sel_key] = st.session_state.get(sel_key, [])
+            saved[category] = {"na": st.session_state.get(na_key, False), "sel": st.session_state.get(sel_key, [])}
     
-    # Clean up persistent state for locations that are no longer valid
-    keys_to_remove = []
-    for key in st.session_state.persistent_feature_state:
-        if key.startswith(('persistent_na_', 'persistent_sel_')) and key not in current_valid_keys:
-            keys_to_remove.append(key)
+    # Clean up persistent state for locations that are no longer valid (the
+    # dict is cleaned in place: the cached ui_state snapshot shares it)
+    for loc in persistent.keys() - valid:
+        del persistent[loc]
     
-    for key in keys_to_remove:
-        del st.session_state.persistent_feature_state[key]
+    st.session_state._feat_saved_for = (leaves_key, persistent)
+    dirty.clear()
 
 def restore_feature_state():
     """Restore feature selections from persistent storage"""
     leaves = get_leaf_locations()
     for loc in leaves:
-        if loc not in FEATURE_TAXONOMY:
+        persistent = st.session_state.persistent_feature_state.get(loc)
+        if not persistent:
             continue
-        for category in FEATURE_TAXONOMY[loc]:
-            na_key = f"na_{loc}_{category}"
-            sel_key = f"sel_{loc}_{category}"
-            
+        for category, _feats, na_key, sel_key in _feature_rows(loc):
             # Initialise keys only if not already present (avoids overriding new user selections)
-            persistent_na_key = f"persistent_na_{loc}_{category}"
-            persistent_sel_key = f"persistent_sel_{loc}_{category}"
-            if na_key not in st.session_state and persistent_na_key in st.session_state.persistent_feature_state:
-                st.session_state[na_key] = st.session_state.persistent_feature_state[persistent_na_key]
-            if sel_key not in st.session_state and persistent_sel_key in st.session_state.persistent_feature_state:
-                st.session_state[sel_key] = st.session_state.persistent_feature_state[persistent_sel_key]
+            saved = persistent.get(category)
+            if saved is None:
+                continue
+            if na_key not in st.session_state:
+                st.session_state[na_key] = saved["na"]
+            if sel_key not in st.session_state:
+                st.session_state[sel_key] = saved["sel"]
 
 
 def save_attribute_state():
     """Save current attribute selections to persistent storage"""
     complete = get_complete_chains()
     
-    # Find the first location key (since we now have one set of attributes per image)
-    first_location_key = None
-    for chain_idx, chain in enumerate(complete):
-        if not chain:
-            continue
-            
-        # Get the leaf location name for this chain
-        chain_values = list(chain.values()) if isinstance(chain, dict) else list(chain)
-        if not chain_values:
-            continue
-        
-        if chain_values[-1] != "N/A":
-            leaf_location = chain_values[-1]
-        elif len(chain_values) > 1:
-            leaf_location = chain_values[-2]
-        else:
-            leaf_location = None
-        
-        if not leaf_location:
-            continue
-            
-        first_location_key = f"loc_{chain_idx}_{leaf_location}"
-        break
+    # Find the first location (since we now have one set of attributes per image)
+    first = _first_location(complete)
     
-    if not first_location_key:
+    if not first:
         return
+    chain_idx, leaf_location = first
+    current = st.session_state.location_attributes.get(_loc_attr_key(chain_idx, leaf_location), {})
     
     # Collect all relevant attributes across all locations
-    all_relevant_attrs = set()
-    for chain in complete:
-        if not chain:
-            continue
-        
-        # Find relevant attributes for this location
-        for attr, locs in ATTRIBUTE_RULES.items():
-            if any(loc in step for step in chain for loc in locs):
-                all_relevant_attrs.add(attr)
+    all_relevant_attrs = get_relevant_attributes(complete)
     
     # Save each attribute to persistent storage
+    persistent = st.session_state.persistent_attribute_state
     for attr in all_relevant_attrs:
-        persistent_key = f"persistent_{first_location_key}_{attr}"
-        
-        # Get current value from location_attributes
-        current_value = st.session_state.location_attributes.get(first_location_key, {}).get(attr, "")
-        st.session_state.persistent_attribute_state[persistent_key] = current_value
+        persistent[(chain_idx, leaf_location, attr)] = current.get(attr, "")
     
-    # Clean up persistent state for old location keys
-    keys_to_remove = []
-    for key in st.session_state.persistent_attribute_state:
-        if key.startswith('persistent_loc_') and not key.startswith(f'persistent_{first_location_key}_'):
-            keys_to_remove.append(key)
+    # Clean up persistent state for old location keys.  Skipped when nothing
+    # could have added a foreign key since the last sweep (same location key,
+    # same dict, same size).
+    swept = (first, persistent, len(persistent))
+    last_swept = st.session_state.get("_attr_swept_for")
+    if last_swept is not None and last_swept[0] == swept[0] and last_swept[1] is persistent and last_swept[2] == swept[2]:
+        return
     
-    for key in keys_to_remove:
-        del st.session_state.persistent_attribute_state[key]
+    for key in [k for k in persistent if k[:2] != first]:
+        del persistent[key]
+    st.session_state._attr_swept_for = (first, persistent, len(persistent))
 
 def restore_attribute_state():
     """Restore attribute selections from persistent storage"""
     complete = get_complete_chains()
     
-    # Find the first location key (since we now have one set of attributes per image)
-    first_location_key = None
-    for chain_idx, chain in enumerate(complete):
-        if not chain:
-            continue
-            
-        # Get the leaf location name for this chain
-        chain_values = list(chain.values()) if isinstance(chain, dict) else list(chain)
-        if not chain_values:
-            continue
-        
-        if chain_values[-1] != "N/A":
-            leaf_location = chain_values[-1]
-        elif len(chain_values) > 1:
-            leaf_location = chain_values[-2]
-        else:
-            leaf_location = None
-        
-        if not leaf_location:
-            continue
-            
-        first_location_key = f"loc_{chain_idx}_{leaf_location}"
-        break
+    # Find the first location (since we now have one set of attributes per image)
+    first = _first_location(complete)
     
-    if not first_location_key:
+    if not first:
         return
+    chain_idx, leaf_location = first
     
     # Initialize attributes in session state if needed
-    if first_location_key not in st.session_state.location_attributes:
-        st.session_state.location_attributes[first_location_key] = {}
+    current = st.session_state.location_attributes.setdefault(_loc_attr_key(chain_idx, leaf_location), {})
     
     # Collect all relevant attributes across all locations
-    all_relevant_attrs = set()
-    for chain in complete:
-        if not chain:
-            continue
-        
-        # Find relevant attributes for this location
-        for attr, locs in ATTRIBUTE_RULES.items():
-            if any(loc in step for step in chain for loc in locs):
-                all_relevant_attrs.add(attr)
+    all_relevant_attrs = get_relevant_attributes(complete)
     
     # Restore each attribute from persistent storage
+    persistent = st.session_state.persistent_attribute_state
     for attr in all_relevant_attrs:
         # Restore attribute value only if not set already in current session
-        persistent_key = f"persistent_{first_location_key}_{attr}"
-        if attr not in st.session_state.location_attributes[first_location_key] and persistent_key in st.session_state.persistent_attribute_state:
-            st.session_state.location_attributes[first_location_key][attr] = st.session_state.persistent_attribute_state[persistent_key]
+        persistent_key = (chain_idx, leaf_location, attr)
+        if attr not in current and persistent_key in persistent:
+            current[attr] = persistent[persistent_key]
+
+
+# Condition score fields and their defaults, shared by save/restore below.
+_CONDITION_DEFAULTS = (
+    ("property_condition", 3.0),
+    ("quality_of_construction", ""),
+    ("improvement_condition", ""),
+)
 
 
 def save_condition_state():
     """Save current condition scores to persistent storage"""
-    st.session_state.persistent_condition_state = {
-        "property_condition": st.session_state.condition_scores["property_condition"],
-        "quality_of_construction": st.session_state.condition_scores["quality_of_construction"],
-        "improvement_condition": st.session_state.condition_scores["improvement_condition"],
-        "property_confirmed": st.session_state.property_condition_confirmed
-    }
+    # Updated in place, and only the fields that differ (usually none)
+    scores = st.session_state.condition_scores
+    persistent = st.session_state.persistent_condition_state
+    for key, _default in _CONDITION_DEFAULTS:
+        if persistent.get(key) != scores[key]:
+            persistent[key] = scores[key]
+    if persistent.get("property_confirmed") != st.session_state.property_condition_confirmed:
+        persistent["property_confirmed"] = st.session_state.property_condition_confirmed
 
 def restore_condition_state():
     """Restore condition scores from persistent storage"""
     if "persistent_condition_state" in st.session_state:
-        st.session_state.condition_scores = {
-            "property_condition": st.session_state.persistent_condition_state.get("property_condition", 3.0),
-            "quality_of_construction": st.session_state.persistent_condition_state.get("quality_of_construction", ""),
-            "improvement_condition": st.session_state.persistent_condition_state.get("improvement_condition", "")
-        }
-        st.session_state.property_condition_confirmed = st.session_state.persistent_condition_state.get("property_confirmed", False)
+        # Called on every rerun; only write scores that actually differ
+        persistent = st.session_state.persistent_condition_state
+        scores = st.session_state.condition_scores
+        for key, default in _CONDITION_DEFAULTS:
+            value = persistent.get(key, default)
+            if scores.get(key, _MISSING) != value:
+                scores[key] = value
+        confirmed = persistent.get("property_confirmed", False)
+        if st.session_state.get("property_condition_confirmed") != confirmed:
+            st.session_state.property_condition_confirmed = confirmed
+
+
+def _chain_view_signature() -> tuple:
+    """What the rest of the page reads from the chains: complete paths and chain count."""
+    paths = _chain_paths()
+    return _complete_paths(paths), sum(1 for path in paths if path)
+
+
+def _rerun_cascade(full: bool) -> None:
+    """Rerun just the location fragment unless the rest of the page is affected.
+
+    A fragment-scoped rerun is only allowed during a fragment rerun; during a
+    full-app run Streamlit raises, and we fall back to a full rerun.
+    """
+    if not full:
+        try:
+            st.rerun(scope="fragment")
+        except StreamlitAPIException:
+            pass
+    st.rerun()
 
 
-def build_location_chain(chain_index: int):
+def build_location_chain(chain_index: int, view_before: tuple | None = None):
     chain = st.session_state.location_chains[chain_index]
+    if view_before is None:
+        view_before = _chain_view_signature()
     container = st.container()
     with container:
         if len(st.session_state.location_chains) > 1 and st.button(
             "❌", key=f"remove_chain_{chain_index}"
         ):
             # Store the leaf location name for thorough cleanup
-            if chain:
-                path = list(chain.values())
-                if path:
-                    leaf_location = path[-1] if path[-1] != "N/A" else path[-2] if len(path) > 1 else None
-                    if leaf_location:
-                        # Add to removed locations set for thorough cleanup
-                        st.session_state.removed_locations.add(f"{chain_index}_{leaf_location}")
+            leaf_location = chain_leaf_location(chain)
+            if leaf_location:
+                # Add to removed locations set for thorough cleanup
+                st.session_state.removed_locations.add(f"{chain_index}_{leaf_location}")
             
             # Clean up feature state for the removed chain BEFORE removing it
             cleanup_feature_state_for_chain(chain_index)
             # Clean up attribute state for the removed chain BEFORE removing it
             cleanup_attribute_state_for_chain(chain_index)
             
-            # After removal, we need to update the indices of all chains that come after this one
-            # First, collect all the state that needs to be re-indexed
-            chains_to_shift = []
-            attributes_to_shift = []
-            widget_states_to_shift = []
-            
-            # Collect location attributes that need re-indexing
-            for location_key in list(st.session_state.location_attributes.keys()):
-                parts = location_key.split('_', 2)
-                if len(parts) >= 3:
-                    try:
-                        key_chain_idx = int(parts[1])
-                        if key_chain_idx > chain_index:
-                            attributes_to_shift.append((location_key, key_chain_idx))
-                    except ValueError:
-                        continue
-            
-            # Collect persistent attribute state that needs re-indexing
-            persistent_attrs_to_shift = []
-            for key in list(st.session_state.persistent_attribute_state.keys()):
-                if key.startswith('persistent_loc_'):
-                    parts = key.split('_', 3)
-                    if len(parts) >= 4:
-                        try:
-                            key_chain_idx = int(parts[2])
-                            if key_chain_idx > chain_index:
-                                persistent_attrs_to_shift.append((key, key_chain_idx))
-                        except ValueError:
-                            continue
-            
-            # Collect widget states that need re-indexing
-            for key in list(st.session_state.widget_states.keys()):
-                if key.startswith('chain_'):
-                    parts = key.split('_', 3)
-                    if len(parts) >= 3:
-                        try:
-                            key_chain_idx = int(parts[1])
-                            if key_chain_idx > chain_index:
-                                widget_states_to_shift.append((key, key_chain_idx))
-                        except ValueError:
-                            continue
-            
             # Remove the chain
             st.session_state.location_chains.pop(chain_index)
             if not st.session_state.location_chains:
                 st.session_state.location_chains = [{}]
             
-            # Re-index all the collected state
-            # Update location attributes
-            for old_key, old_idx in attributes_to_shift:
-                old_value = st.session_state.location_attributes.pop(old_key)
-                parts = old_key.split('_', 2)
-                new_key = f"loc_{old_idx - 1}_{parts[2]}"
-                st.session_state.location_attributes[new_key] = old_value
-            
-            # Update persistent attribute state
-            for old_key, old_idx in persistent_attrs_to_shift:
-                old_value = st.session_state.persistent_attribute_state.pop(old_key)
-                parts = old_key.split('_', 3)
-                new_key = f"persistent_loc_{old_idx - 1}_{parts[3]}"
-                st.session_state.persistent_attribute_state[new_key] = old_value
-            
-            # Update widget states
-            for old_key, old_idx in widget_states_to_shift:
-                old_value = st.session_state.widget_states.pop(old_key)
-                parts = old_key.split('_', 3)
-                if len(parts) >= 4:
-                    new_key = f"chain_{old_idx - 1}_{parts[2]}_{parts[3]}"
-                    st.session_state.widget_states[new_key] = old_value
+            # After removal, update the indices of all state belonging to the
+            # chains that came after this one (one pass per dict)
+            st.session_state.location_attributes = _shift_chain_keys(
+                st.session_state.location_attributes, chain_index
+            )
+            st.session_state.persistent_attribute_state = _shift_tuple_keys(
+                st.session_state.persistent_attribute_state, chain_index
+            )
+            st.session_state.widget_states = _shift_tuple_keys(
+                st.session_state.widget_states, chain_index
+            )
             
             st.session_state.widget_refresh_counter += 1
             st.rerun()
             return
 
-        current_path, level = [], 0
+        # Walk the spatial taxonomy alongside the chain: *node* is the taxonomy
+        # node for the levels selected so far, so options and the leaf test are
+        # plain dict reads instead of a path lookup per level.
+        node, level = _SPATIAL, 0
         chain_changed = False
         
         while True:
             key_lv = f"level_{level}"
             prev = chain.get(key_lv, "")
-            opts = get_children_options(LOCATION_TAXONOMY["spatial"], current_path)
+            opts = list(node.keys()) if isinstance(node, dict) else []
             if not opts: break
             if level > 0: opts += ["N/A"]
 
             # Stable widget key per chain/level to avoid unnecessary resets across reruns
             w_key = f"chain_{chain_index}_level_{level}"
-            state_key = f"chain_{chain_index}_level_{level}_state"
+            state_key = (chain_index, level)
 
             # Get stored value from our dedicated state storage
             if state_key in st.session_state.widget_states:
@@ -626,7 +805,6 @@ def build_location_chain(chain_index: int):
                 else:
                     # 2) Snap to closest option using same normalisation as label_strings_to_chains
                     def _norm(txt: str) -> str:
-                        import re
                         s = txt.strip().lower()
                         return re.sub(r"[^a-z0-9]", "", s)
                     t = _norm(str(stored))
@@ -683,47 +861,25 @@ def build_location_chain(chain_index: int):
                 if old_path_to_clean:
                     cleanup_attribute_state_for_path(old_path_to_clean, chain_index)
                 
+                # Deepest level any widget of this chain can have been rendered at
+                max_level = max(len(chain), _SPATIAL_DEPTH)
+                
                 # Clear children levels from the chain (only for this specific chain)
-                keys_to_remove = []
-                for k in chain.keys():
-                    if k.startswith("level_") and int(k.split("_")[1]) > level:
-                        keys_to_remove.append(k)
-                for k in keys_to_remove:
+                for k in [k for k in chain if k.startswith("level_") and int(k[6:]) > level]:
                     del chain[k]
                 
                 # Clear widget states only for this specific chain and levels beyond current
-                widget_keys_to_remove = []
-                for k in list(st.session_state.widget_states.keys()):
-                    if k.startswith(f"chain_{chain_index}_level_") and k.endswith("_state"):
-                        # Extract level from key like "chain_0_level_2_state"
-                        parts = k.split("_")
-                        if len(parts) >= 4:
-                            try:
-                                key_level = int(parts[3])
-                                if key_level > level:
-                                    widget_keys_to_remove.append(k)
-                            except ValueError:
-                                continue
-                
-                for k in widget_keys_to_remove:
-                    del st.session_state.widget_states[k]
+                widget_states = st.session_state.widget_states
+                for k in [k for k in widget_states if k[0] == chain_index and k[1] > level]:
+                    del widget_states[k]
 
                 # Also clear actual Streamlit widget values for deeper levels so they don't override indices
-                # Keys look like: chain_{chain_index}_level_{N}
-                widget_value_keys_to_remove = []
-                for k in list(st.session_state.keys()):
-                    if k.startswith(f"chain_{chain_index}_level_") and not k.endswith("_state"):
-                        parts = k.split("_")
-                        if len(parts) >= 4:
-                            try:
-                                key_level = int(parts[3])
-                                if key_level > level:
-                                    widget_value_keys_to_remove.append(k)
-                            except ValueError:
-                                continue
-
-                for k in widget_value_keys_to_remove:
-                    del st.session_state[k]
+                # Keys look like: chain_{chain_index}_level_{N}; probe them directly
+                # instead of scanning every session-state key
+                ss = st.session_state
+                for k in [f"chain_{chain_index}_level_{n}" for n in range(level + 1, max_level + 1)]:
+                    if k in ss:
+                        del ss[k]
 
             if sel:
                 chain[key_lv] = sel
@@ -731,113 +887,65 @@ def build_location_chain(chain_index: int):
                 chain.pop(key_lv, None)
                 break
 
-            current_path = [chain[f"level_{i}"] for i in range(level + 1)]
-            if sel == "N/A" or is_leaf_node(LOCATION_TAXONOMY["spatial"], current_path):
+            node = node.get(sel, _MISSING)
+            if sel == "N/A" or not isinstance(node, dict) or not node:
                 break
             level += 1
 
-        # Force rerun when chain changes to update current selections immediately
+        # Force rerun when chain changes to update current selections immediately.
+        # Features, attributes and validation only depend on the complete chains,
+        # so edits inside a still-incomplete chain only need the fragment redrawn.
         if chain_changed:
-            st.rerun()
+            _rerun_cascade(full=_chain_view_signature() != view_before)
 
         if chain:
             st.markdown("---")
 
+@st.fragment
 def build_dropdown_cascade_ui():
     st.markdown("### 📍 Location Selection")
     # Wrap the potentially long selector list inside a fixed-height, scrollable container.
     # When the content exceeds the specified height Streamlit will add an internal scroll bar,
     # keeping the overall page length manageable while still providing access to all widgets.
     with st.container(height=480, border=True):
+        # Any edit to a chain reruns before the next one is drawn, so the
+        # signature taken once up front holds for every chain in the loop.
+        view_before = _chain_view_signature()
         for i in range(len(st.session_state.location_chains)):
-            build_location_chain(i)
+            build_location_chain(i, view_before)
 
         col1, _ = st.columns([1, 3])
         with col1:
             if st.button("➕ Add Another Location", key="add_location"):
                 # Comprehensive cleanup of any stale persistent state before adding new location
-                # This prevents data from previously removed locations from reappearing
-                
-                # Get current valid location names to preserve their state
-                current_leaves = get_leaf_locations()
-                
-                # Clean up feature persistent state - remove any state not associated with current locations
-                feature_keys_to_remove = []
-                for key in list(st.session_state.persistent_feature_state.keys()):
-                    if key.startswith(('persistent_na_', 'persistent_sel_')):
-                        # Extract location name from key
-                        key_parts = key.split('_', 3)  # ['persistent', 'na/sel', 'location', 'category']
-                        if len(key_parts) >= 3:
-                            location_name = key_parts[2]
-                            # Only keep if this location is currently valid
-                            if location_name not in current_leaves:
-                                feature_keys_to_remove.append(key)
-                
-                for key in feature_keys_to_remove:
-                    del st.session_state.persistent_feature_state[key]
+                # This prevents data from previously removed locations from reappearing.
+                # Stale state only exists after a removal, so skip the scans otherwise.
+                if st.session_state.removed_locations:
+                    # Get current valid location names to preserve their state
+                    current_leaves = get_leaf_locations()
                 
-                # Clean up attribute persistent state - remove any state not associated with current chain indices
-                current_chain_count = len(st.session_state.location_chains)
-                attr_keys_to_remove = []
-                for key in list(st.session_state.persistent_attribute_state.keys()):
-                    if key.startswith('persistent_loc_'):
-                        parts = key.split('_', 3)
-                        if len(parts) >= 4:
-                            try:
-                                key_chain_idx = int(parts[2])
-                                # Remove if chain index is beyond current chains
-                                if key_chain_idx >= current_chain_count:
-                                    attr_keys_to_remove.append(key)
-                            except ValueError:
-                                # Remove malformed keys
-                                attr_keys_to_remove.append(key)
+                    # Clean up feature persistent state - remove any state not associated with current locations
+                    persistent = st.session_state.persistent_feature_state
+                    for location_name in [loc for loc in persistent if loc not in current_leaves]:
+                        del persistent[location_name]
                 
-                for key in attr_keys_to_remove:
-                    del st.session_state.persistent_attribute_state[key]
+                    # Drop attribute, location-attribute and widget state that
+                    # references chain indices that no longer exist
+                    current_chain_count = len(st.session_state.location_chains)
+                    for d in (
+                        st.session_state.persistent_attribute_state,
+                        st.session_state.location_attributes,
+                        st.session_state.widget_states,
+                    ):
+                        _prune_chain_keys(d, current_chain_count)
                 
-                # Clean up any location attributes that reference invalid chain indices
-                loc_attr_keys_to_remove = []
-                for key in list(st.session_state.location_attributes.keys()):
-                    if key.startswith('loc_'):
-                        parts = key.split('_', 2)
-                        if len(parts) >= 3:
-                            try:
-                                key_chain_idx = int(parts[1])
-                                # Remove if chain index is beyond current chains
-                                if key_chain_idx >= current_chain_count:
-                                    loc_attr_keys_to_remove.append(key)
-                            except ValueError:
-                                # Remove malformed keys
-                                loc_attr_keys_to_remove.append(key)
-                
-                for key in loc_attr_keys_to_remove:
-                    del st.session_state.location_attributes[key]
-                
-                # Clean up widget states for invalid chain indices
-                widget_keys_to_remove = []
-                for key in list(st.session_state.widget_states.keys()):
-                    if key.startswith('chain_'):
-                        parts = key.split('_', 3)
-                        if len(parts) >= 3:
-                            try:
-                                key_chain_idx = int(parts[1])
-                                # Remove if chain index is beyond current chains
-                                if key_chain_idx >= current_chain_count:
-                                    widget_keys_to_remove.append(key)
-                            except ValueError:
-                                # Remove malformed keys
-                                widget_keys_to_remove.append(key)
-                
-                for key in widget_keys_to_remove:
-                    del st.session_state.widget_states[key]
-                
-                # Clear the removed locations tracking set since we've cleaned up
-                st.session_state.removed_locations = set()
+                    # Clear the removed locations tracking set since we've cleaned up
+                    st.session_state.removed_locations = set()
                 
                 # Add the new empty location chain
                 st.session_state.location_chains.append({})
                 
-                st.rerun()
+                _rerun_cascade(full=False)
                 
     complete = get_complete_chains()
     total = len([c for c in st.session_state.location_chains if c])
@@ -847,28 +955,30 @@ def build_dropdown_cascade_ui():
         st.warning(f"⚠️ {len(complete)}/{total} complete")
 
 
-def build_location_features(location: str):
-    """Per‐category N/A checkbox + multiselect—stores only in st.session_state."""
-    if location not in FEATURE_TAXONOMY:
-        return
+def build_location_features(location: str) -> Dict[Tuple[str, str], bool]:
+    """Per‐category N/A checkbox + multiselect—stores only in st.session_state.
 
-    for category, feats in FEATURE_TAXONOMY[location].items():
+    Returns ``{(location, category): is_complete}`` built from the widget values
+    so callers don't need a second pass over session state to compute completion.
+    """
+    status: Dict[Tuple[str, str], bool] = {}
+    persistent = st.session_state.persistent_feature_state.get(location, {})
+    # N/A toggles need one rerun to redraw; deferred until every category is built
+    pending_rerun = False
+    for category, feats, na_key, sel_key in _feature_rows(location):
         st.write(f"**{category}:**")
 
-        na_key  = f"na_{location}_{category}"
-        sel_key = f"sel_{location}_{category}"
-
         # Initialise keys only if not already present (avoids overriding new user selections)
-        persistent_na_key = f"persistent_na_{location}_{category}"
-        persistent_sel_key = f"persistent_sel_{location}_{category}"
-        if na_key not in st.session_state:
-            st.session_state[na_key] = st.session_state.persistent_feature_state.get(persistent_na_key, False)
-        if sel_key not in st.session_state:
-            st.session_state[sel_key] = st.session_state.persistent_feature_state.get(persistent_sel_key, [])
-
-        # Get current state
-        current_na = st.session_state.get(na_key, False)
-        current_selections = st.session_state.get(sel_key, [])
+        if na_key not in st.session_state or sel_key not in st.session_state:
+            saved = persistent.get(category, {})
+            if na_key not in st.session_state:
+                st.session_state[na_key] = saved.get("na", False)
+            if sel_key not in st.session_state:
+                st.session_state[sel_key] = saved.get("sel", [])
+
+        # Get current state (both keys are guaranteed to exist at this point)
+        current_na = st.session_state[na_key]
+        current_selections = st.session_state[sel_key]
         
         # Handle mutual exclusivity BEFORE creating widgets
         if current_selections and current_na:
@@ -883,7 +993,8 @@ def build_location_features(location: str):
             na_checked = st.checkbox(
                 "N/A",
                 key=na_key,
-                #value=current_na,
+                on_change=_mark_feature_dirty,
+                args=(location, category),
             )
 
         with col_sel:
@@ -894,11 +1005,9 @@ def build_location_features(location: str):
                     feats,
                     key=sel_key,
                     label_visibility="collapsed",
+                    on_change=_mark_feature_dirty,
+                    args=(location, category),
                 )
-                # If features were selected while N/A was checked in prev state, clear N/A
-                if selected_features and na_checked:
-                    st.session_state[na_key] = False
-                    st.rerun()
             else:
                 # Minimal marker so column keeps height but no extra padding
                 st.markdown("✅")
@@ -909,12 +1018,21 @@ def build_location_features(location: str):
             if na_checked:
                 # Clear selections when N/A is set
                 st.session_state[sel_key] = []
-            # Force UI update
-            st.rerun()
+            # Force UI update (once, after the loop)
+            pending_rerun = True
+
+        # A category is complete if it has EITHER N/A OR selections (but not both)
+        has_selections = bool(st.session_state[sel_key] if na_checked else selected_features)
+        status[(location, category)] = na_checked != has_selections
+
+    if pending_rerun:
+        st.rerun()
+    return status
 
 def build_feature_ui():
     st.markdown("### 🔧 Features in Selected Locations")
-    leaves = get_leaf_locations()
+    # Already sorted, so the tab order below needs no further sort
+    leaves = _sorted_leaf_locations()
     if not leaves:
         st.info("👆 Complete location selections to see features.")
         return
@@ -931,33 +1049,24 @@ def build_feature_ui():
 
     st.caption("💡 Select features or mark N/A.")
 
+    # Category-level completion is recorded while the widgets are built
+    status: Dict[Tuple[str, str], bool] = {}
+
     # Constrain the (potentially large) feature selection UI to a scrollable box.
     with st.container(height=500, border=True):
         if len(avail) == 1:
-            build_location_features(avail[0])
+            status = build_location_features(avail[0])
         else:
-            tabs = st.tabs([f"📍 {loc}" for loc in sorted(avail)])
-            for i, loc in enumerate(sorted(avail)):
+            tabs = st.tabs([f"📍 {loc}" for loc in avail])
+            for i, loc in enumerate(avail):
                 with tabs[i]:
-                    build_location_features(loc)
+                    status.update(build_location_features(loc))
 
     # Save state after UI is built (this preserves state for location changes)
     save_feature_state()
 
-    # Category-level completion check
-    total_cats = sum(len(FEATURE_TAXONOMY[loc]) for loc in avail)
-    done_cats  = 0
-
-    for loc in avail:
-        for category in FEATURE_TAXONOMY[loc]:
-            na_key  = f"na_{loc}_{category}"
-            sel_key = f"sel_{loc}_{category}"
-            # Count as complete if either N/A is checked OR features are selected (but not both)
-            is_na = st.session_state.get(na_key, False)
-            has_selections = bool(st.session_state.get(sel_key, []))
-            # A category is complete if it has EITHER N/A OR selections (but not both)
-            if (is_na and not has_selections) or (not is_na and has_selections):
-                done_cats += 1
+    total_cats = len(status)
+    done_cats  = sum(status.values())
 
     # Display feature completion status
     if total_cats > 0:
@@ -975,71 +1084,34 @@ def build_contextual_attribute_ui():
         return
     
     # Collect all relevant attributes across all locations
-    all_relevant_attrs = set()
-    for chain in complete:
-        if not chain:
-            continue
-        
-        # Find relevant attributes for this location
-        for attr, locs in ATTRIBUTE_RULES.items():
-            if any(loc in step for step in chain for loc in locs):
-                all_relevant_attrs.add(attr)
+    all_relevant_attrs = get_relevant_attributes(complete)
     
     if not all_relevant_attrs:
         st.info("No attributes apply to the selected locations.")
         return
     
-    # Track completion status
-    total_attrs = len(all_relevant_attrs)
-    completed_attrs = 0
-    
     # Use the first location key for storing attributes (since we now have one set per image)
-    first_location_key = None
-    for chain_idx, chain in enumerate(complete):
-        if not chain:
-            continue
-        
-        # Get the leaf location name for this chain
-        chain_values = list(chain.values()) if isinstance(chain, dict) else list(chain)
-        if not chain_values:
-            continue
-        
-        if chain_values[-1] != "N/A":
-            leaf_location = chain_values[-1]
-        elif len(chain_values) > 1:
-            leaf_location = chain_values[-2]
-        else:
-            leaf_location = None
-        
-        if not leaf_location:
-            continue
-        
-        first_location_key = f"loc_{chain_idx}_{leaf_location}"
-        break
+    first_location_key = _first_location_key(complete)
     
     if not first_location_key:
         st.error("No valid location found for attributes.")
         return
     
-    # Initialize attributes in session state if needed
-    if first_location_key not in st.session_state.location_attributes:
-        st.session_state.location_attributes[first_location_key] = {}
+    # Initialize attributes in session state if needed; bound once so the
+    # per-attribute reads/writes below skip the session-state proxy
+    current_attrs = st.session_state.location_attributes.setdefault(first_location_key, {})
     
     # Display attributes in a single section
-    attr_map = LOCATION_TAXONOMY.get("attributes", {})
-    for attr in sorted(all_relevant_attrs):
-        opts = attr_map.get(attr, [])
-        disp = attr.replace("_", " ").title()
+    for attr in _ATTR_DISPLAY_ORDER:
+        if attr not in all_relevant_attrs:
+            continue
+        disp, choices = _ATTR_WIDGETS[attr]
         
         # Get current value with empty string as default (forces selection)
-        current_value = st.session_state.location_attributes[first_location_key].get(attr, "")
+        current_value = current_attrs.get(attr, "")
         
         # Calculate index - default to 0 (blank/empty option)
-        idx = 0
-        if current_value == "N/A":
-            idx = 1  # N/A is at index 1
-        elif current_value in opts:
-            idx = opts.index(current_value) + 2  # +2 because we add blank and N/A options
+        idx = choices.index(current_value) if current_value in choices else 0
         
         # Create a stable widget key per attribute
         widget_key = f"attr_{attr}"
@@ -1047,23 +1119,21 @@ def build_contextual_attribute_ui():
         # Display the dropdown with a blank first option
         choice = st.selectbox(
             disp, 
-            [""] + ["N/A"] + opts,  # Blank first option, then N/A, then actual options
+            choices,  # Blank first option, then N/A, then actual options
             index=idx,
             key=widget_key
         )
         
         # Update the selection immediately in session state
         # Removed st.rerun() to avoid expensive full page reload on every dropdown change
-        st.session_state.location_attributes[first_location_key][attr] = choice
-        
-        # Count completed attributes
-        if choice != "":
-            completed_attrs += 1
+        current_attrs[attr] = choice
     
     # Save attribute state after UI is built
     save_attribute_state()
     
-    # Display completion status
+    # Display completion status, tallied once from the stored selections
+    total_attrs = len(all_relevant_attrs)
+    completed_attrs = sum(1 for attr in all_relevant_attrs if current_attrs.get(attr, "") != "")
     if total_attrs > 0:
         if completed_attrs == total_attrs:
             st.success(f"✅ All {total_attrs} attributes complete")
@@ -1071,6 +1141,35 @@ def build_contextual_attribute_ui():
             st.warning(f"⚠️ {completed_attrs}/{total_attrs} attributes complete")
 
 
+# Textual labels rendered under the property-condition slider (1 ➜ 5)
+_CONDITION_LABELS_HTML = """
+<div style="display: flex; justify-content: space-between; margin-top: -10px; margin-bottom: 10px; padding: 0 8px;">
+    <span style="font-size: 12px; color: #6e6e6e; text-align: left;">Excellent</span>
+    <span style="font-size: 12px; color: #6e6e6e; text-align: center;">Good</span>
+    <span style="font-size: 12px; color: #6e6e6e; text-align: center;">Average</span>
+    <span style="font-size: 12px; color: #6e6e6e; text-align: center;">Fair</span>
+    <span style="font-size: 12px; color: #6e6e6e; text-align: right;">Poor</span>
+</div>
+"""
+
+
+# Flipped interpretation of the property condition score (1=Excellent, 5=Poor).
+# The score snaps to the nearest 0.1 step first, so e.g. 1.96 reads as "Good".
+_CONDITION_INTERPRETATIONS = ("Excellent", "Good", "Average", "Fair", "Poor")
+_CONDITION_STEPS = tuple(round(1 + i / 10, 1) for i in range(41))
+
+# Segmented-control options for the two discrete condition scores
+_QUALITY_OPTIONS = ("N/A", "Below Standard", "Standard", "Good Quality", "High Quality", "Premium")
+_IMPROVEMENT_OPTIONS = ("N/A", "Not Updated", "Updated", "Remodeled")
+
+
+def _condition_interpretation(score: float) -> str:
+    i = bisect_left(_CONDITION_STEPS, score)
+    # Nearest step is one of the two neighbours; ties go to the lower one
+    closest = min(_CONDITION_STEPS[max(i - 1, 0):i + 1], key=lambda x: abs(x - score))
+    return _CONDITION_INTERPRETATIONS[int(closest) - 1]
+
+
 def build_condition_scores_ui():
     # st.subheader("🏠 Property Condition Assessment")
     # st.caption("Rate the property condition")
@@ -1085,7 +1184,9 @@ def build_condition_scores_ui():
         st.caption("Overall condition of the property structure and systems")
         
         prop_key = "prop_condition_slider"
-        current_prop_score = st.session_state.condition_scores["property_condition"]
+        # Bound once: every read/write below goes through the local name
+        scores = st.session_state.condition_scores
+        current_prop_score = scores["property_condition"]
         na_checked = st.session_state.get("property_condition_na", False)
         confirm_checked = st.session_state.property_condition_confirmed
 
@@ -1114,29 +1215,10 @@ def build_condition_scores_ui():
         # ----------------------------------------------
 
         with st.container():
-            labels_html = """
-            <div style="display: flex; justify-content: space-between; margin-top: -10px; margin-bottom: 10px; padding: 0 8px;">
-                <span style="font-size: 12px; color: #6e6e6e; text-align: left;">Excellent</span>
-                <span style="font-size: 12px; color: #6e6e6e; text-align: center;">Good</span>
-                <span style="font-size: 12px; color: #6e6e6e; text-align: center;">Average</span>
-                <span style="font-size: 12px; color: #6e6e6e; text-align: center;">Fair</span>
-                <span style="font-size: 12px; color: #6e6e6e; text-align: right;">Poor</span>
-            </div>
-            """
-            st.markdown(labels_html, unsafe_allow_html=True)
+            st.markdown(_CONDITION_LABELS_HTML, unsafe_allow_html=True)
 
         # Show current score with flipped interpretation
-        score_interpretation = {
-            1.0: "Excellent", 1.1: "Excellent", 1.2: "Excellent", 1.3: "Excellent", 1.4: "Excellent", 1.5: "Excellent", 1.6: "Excellent", 1.7: "Excellent", 1.8: "Excellent", 1.9: "Excellent",
-            2.0: "Good", 2.1: "Good", 2.2: "Good", 2.3: "Good", 2.4: "Good", 2.5: "Good", 2.6: "Good", 2.7: "Good", 2.8: "Good", 2.9: "Good",
-            3.0: "Average", 3.1: "Average", 3.2: "Average", 3.3: "Average", 3.4: "Average", 3.5: "Average", 3.6: "Average", 3.7: "Average", 3.8: "Average", 3.9: "Average",
-            4.0: "Fair", 4.1: "Fair", 4.2: "Fair", 4.3: "Fair", 4.4: "Fair", 4.5: "Fair", 4.6: "Fair", 4.7: "Fair", 4.8: "Fair", 4.9: "Fair",
-            5.0: "Poor"
-        }
-        
-        # Use two-decimal precision when displaying
-        closest_score = min(score_interpretation.keys(), key=lambda x: abs(x - current_prop_score))
-        current_interpretation = score_interpretation[closest_score]
+        current_interpretation = _condition_interpretation(current_prop_score)
         if na_checked:
             st.markdown(f"**Current Score: N/A**")
         else:
@@ -1149,27 +1231,30 @@ def build_condition_scores_ui():
         with col_na:
             na = st.checkbox("N/A", value=na_checked, disabled=confirm_checked)
         
-        # Mutually exclusive logic - removed st.rerun() to avoid expensive full page reload
+        # Mutually exclusive logic - removed st.rerun() to avoid expensive full page reload.
+        # Branches only mutate state; persistence happens once at the end of the function.
+        _dirty = False
         if na and not na_checked:
             st.session_state.property_condition_na = True
             st.session_state.property_condition_confirmed = False
-            save_condition_state()
+            _dirty = True
         elif confirm and not confirm_checked:
             st.session_state.property_condition_confirmed = True
             st.session_state.property_condition_na = False
-            save_condition_state()
+            _dirty = True
         elif not na and na_checked:
             st.session_state.property_condition_na = False
-            save_condition_state()
+            _dirty = True
         elif not confirm and confirm_checked:
             st.session_state.property_condition_confirmed = False
-            save_condition_state()
+            _dirty = True
 
         # Update slider value without full page reload
         if not (confirm_checked or na_checked):
-            if abs(new_prop_score - current_prop_score) > 0.00009:  # tighter tolerance due to higher precision
-                st.session_state.condition_scores["property_condition"] = new_prop_score
-                save_condition_state()
+            # Compare at the slider's 0.001 resolution
+            if round(new_prop_score * 1000) != round(current_prop_score * 1000):
+                scores["property_condition"] = new_prop_score
+                _dirty = True
 
         st.markdown("---")
         
@@ -1180,22 +1265,13 @@ def build_condition_scores_ui():
             st.markdown("### 🔨 Quality of Construction")
             st.caption("Materials, workmanship, and construction standards")
             
-            quality_options = [
-                "N/A",
-                "Below Standard",
-                "Standard", 
-                "Good Quality",
-                "High Quality",
-                "Premium"
-            ]
-            
-            current_quality = st.session_state.condition_scores["quality_of_construction"]
+            current_quality = scores["quality_of_construction"]
             quality_key = "quality_slider"
             
             # Use select_slider for discrete selection with slider appearance
             selected_quality = st.segmented_control(
                 "Quality Level",
-                options=quality_options,
+                options=_QUALITY_OPTIONS,
                 default=None if current_quality == "" else current_quality,
                 key=quality_key,
                 label_visibility="collapsed"
@@ -1203,8 +1279,8 @@ def build_condition_scores_ui():
             
             # Update selection immediately
             if selected_quality != current_quality:
-                st.session_state.condition_scores["quality_of_construction"] = selected_quality
-                save_condition_state()
+                scores["quality_of_construction"] = selected_quality
+                _dirty = True
             
             # Show current selection
             if selected_quality:
@@ -1216,20 +1292,13 @@ def build_condition_scores_ui():
             st.markdown("### 🔧 Improvement Condition")
             st.caption("Condition of improvements, updates, and maintenance")
             
-            improvement_options = [
-                "N/A",
-                "Not Updated",
-                "Updated", 
-                "Remodeled"
-            ]
-            
-            current_improvement = st.session_state.condition_scores["improvement_condition"]
+            current_improvement = scores["improvement_condition"]
             improvement_key = "improvement_slider"
             
             # Use select_slider for discrete selection with slider appearance
             selected_improvement = st.segmented_control(
                 "Improvement Level",
-                options=improvement_options,
+                options=_IMPROVEMENT_OPTIONS,
                 default=None if current_improvement == "" else current_improvement,
                 key=improvement_key,
                 label_visibility="collapsed"
@@ -1237,8 +1306,8 @@ def build_condition_scores_ui():
             
             # Update selection immediately
             if selected_improvement != current_improvement:
-                st.session_state.condition_scores["improvement_condition"] = selected_improvement
-                save_condition_state()
+                scores["improvement_condition"] = selected_improvement
+                _dirty = True
             
             # Show current selection
             if selected_improvement:
@@ -1253,13 +1322,11 @@ def build_condition_scores_ui():
         
         # Add completion status for condition scores
         total_conditions = 3  # Property condition, Quality, Improvement
-        completed_conditions = 0
-        if st.session_state.property_condition_confirmed or st.session_state.get("property_condition_na", False):
-            completed_conditions += 1
-        if st.session_state.condition_scores["quality_of_construction"]:
-            completed_conditions += 1
-        if st.session_state.condition_scores["improvement_condition"]:
-            completed_conditions += 1
+        property_na = st.session_state.get("property_condition_na", False)
+        quality_summary = scores["quality_of_construction"]
+        improvement_summary = scores["improvement_condition"]
+        property_done = bool(st.session_state.property_condition_confirmed or property_na)
+        completed_conditions = property_done + bool(quality_summary) + bool(improvement_summary)
         if completed_conditions == total_conditions:
             st.success(f"✅ All {total_conditions} condition scores complete")
         else:
@@ -1268,7 +1335,7 @@ def build_condition_scores_ui():
         # Show the scores in a grid
         summary_cols = st.columns(3)
         with summary_cols[0]:
-            if st.session_state.get("property_condition_na", False):
+            if property_na:
                 st.metric(
                     "Property Condition",
                     "N/A",
@@ -1277,160 +1344,146 @@ def build_condition_scores_ui():
             else:
                 st.metric(
                     "Property Condition",
-                    f"{st.session_state.condition_scores['property_condition']:.3f}",
+                    f"{scores['property_condition']:.3f}",
                     delta=f"({current_interpretation})"
                 )
         
         with summary_cols[1]:
-            quality_summary = st.session_state.condition_scores["quality_of_construction"] or "Not Selected"
             st.metric(
                 "Quality of Construction", 
-                quality_summary,
+                quality_summary or "Not Selected",
                 delta=None
             )
         
         with summary_cols[2]:
-            improvement_summary = st.session_state.condition_scores["improvement_condition"] or "Not Selected"
             st.metric(
                 "Improvement Condition",
-                improvement_summary,
+                improvement_summary or "Not Selected",
                 delta=None
             )
         
         # Reset button
-        if st.button("🔄 Reset Condition Scores", key=f"reset_conditions_{st.session_state.widget_refresh_counter}"):
+        if st.button("🔄 Reset Condition Scores", key="reset_conditions"):
             st.session_state.condition_scores = {
                 "property_condition": 3.0,
                 "quality_of_construction": "",
                 "improvement_condition": ""
             }
             st.session_state.property_condition_confirmed = False
-            save_condition_state()
+            _dirty = True
     
-    # Save state after UI is built
-    save_condition_state()
+    # Save state once after UI is built, only if something changed this run
+    if _dirty:
+        save_condition_state()
 
 # ====== VALIDATION ======
 def is_selection_complete() -> bool:
     complete = get_complete_chains()
     return bool(complete) and len(complete) == len([c for c in st.session_state.location_chains if c])
 
-def _get_validation_cache_key() -> str:
-    """Generate a cache key based on current UI state for validation caching."""
-    import hashlib
-    import json
-    
-    # Create a snapshot of relevant session state for caching
-    cache_data = {
-        'location_chains': st.session_state.get('location_chains', []),
-        'location_attributes': st.session_state.get('location_attributes', {}),
-        'condition_scores': st.session_state.get('condition_scores', {}),
-        'property_condition_confirmed': st.session_state.get('property_condition_confirmed', False),
-        'property_condition_na': st.session_state.get('property_condition_na', False),
-    }
+def _get_validation_cache_key(ss: Dict | None = None) -> tuple:
+    """Generate a cache key based on current UI state for validation caching.
+
+    The key is a nested tuple of the relevant state.  Tuples hash and compare
+    in C, which is far cheaper than ``md5(json.dumps(..., sort_keys=True))``
+    and, compared by equality, cannot produce false hits.
+
+    ``ss`` defaults to ``st.session_state``; any mapping with ``.get`` works.
+    """
+    if ss is None:
+        ss = st.session_state
+    chains = tuple(tuple(chain.items()) for chain in ss.get('location_chains', []))
+    attributes = tuple(
+        sorted((key, tuple(sorted(attrs.items()))) for key, attrs in ss.get('location_attributes', {}).items())
+    )
+    conditions = tuple(sorted(ss.get('condition_scores', {}).items()))
     
-    # Add feature selections to cache data
-    leaves = get_leaf_locations()
-    for loc in leaves:
-        if loc not in FEATURE_TAXONOMY:
-            continue
-        for category in FEATURE_TAXONOMY[loc]:
-            na_key = f"na_{loc}_{category}"
-            sel_key = f"sel_{loc}_{category}"
-            cache_data[na_key] = st.session_state.get(na_key, False)
-            cache_data[sel_key] = st.session_state.get(sel_key, [])
+    # Add feature selections to the key
+    features = []
+    for _loc, _category, na_key, sel_key in _feature_keys(_sorted_leaf_locations()):
+        features.append((ss.get(na_key, False), tuple(ss.get(sel_key, []))))
     
-    # Create hash of the state
-    cache_str = json.dumps(cache_data, sort_keys=True)
-    return hashlib.md5(cache_str.encode()).hexdigest()
+    return (
+        chains,
+        attributes,
+        conditions,
+        ss.get('property_condition_confirmed', False),
+        ss.get('property_condition_na', False),
+        tuple(features),
+    )
 
 def can_move_on() -> bool:
-    # Check cache first to avoid expensive validation
+    # Check cache first to avoid expensive validation.  The cache is a single
+    # (key, result) slot, so a miss simply overwrites it – no session scan.
+    # The key reads only the keys it needs (the na_/sel_ keys of the current
+    # leaves); st.session_state.to_dict() would walk every session key.
     cache_key = _get_validation_cache_key()
-    cache_result_key = f"_validation_cache_{cache_key}"
-    
-    if cache_result_key in st.session_state:
-        return st.session_state[cache_result_key]
+    cached_key, cached_result = st.session_state.get("_validation_cache", (None, None))
+    if cached_key == cache_key:
+        return cached_result
     
     # Run the actual validation
     result = _can_move_on_uncached()
     
     # Cache the result
-    st.session_state[cache_result_key] = result
-    
-    # Clean up old cache entries (keep only the current one)
-    keys_to_remove = [k for k in st.session_state.keys() if k.startswith('_validation_cache_') and k != cache_result_key]
-    for key in keys_to_remove:
-        del st.session_state[key]
+    st.session_state._validation_cache = (cache_key, result)
     
     return result
 
-def _can_move_on_uncached() -> bool:
+@lru_cache(maxsize=16)
+def _validation_plan(
+    complete: Tuple[Tuple[str, ...], ...],
+) -> Tuple[str | None, Tuple[str, ...], Tuple[Tuple[str, str], ...]]:
+    """``(first_location_key, required_attributes, feature_key_pairs)`` for a set of complete paths.
+
+    Partially evaluates validation against the static ATTRIBUTE_RULES and
+    FEATURE_TAXONOMY so a rerun with unchanged chains only does the value
+    checks; ``feature_key_pairs`` is the flat ``(na_key, sel_key)`` tuple for
+    the chains' leaves.
+    """
+    feature_pairs = tuple(
+        (na_key, sel_key)
+        for _loc, _category, na_key, sel_key in _feature_keys(_sorted_leaves(_leaf_locations_for(complete)))
+    )
+    paths = [list(path) for path in complete]
+    first_location_key = _first_location_key(paths)
+    if not first_location_key:
+        return None, (), feature_pairs
+    return first_location_key, tuple(sorted(get_relevant_attributes(paths))), feature_pairs
+
+
+def _can_move_on_uncached(ss: Dict | None = None) -> bool:
     """Actual validation logic without caching."""
+    if ss is None:
+        ss = st.session_state
+
     # 1) Spatial must be done
     if not is_selection_complete():
         return False
 
-    # 2) Every feature-category must have either N/A checked OR at least one feature selected (but not both)
-    leaves = get_leaf_locations()
-    for loc in leaves:
-        if loc not in FEATURE_TAXONOMY:
-            continue
-        for category in FEATURE_TAXONOMY[loc]:
-            na_key  = f"na_{loc}_{category}"
-            sel_key = f"sel_{loc}_{category}"
-            
-            # Get current state
-            is_na = st.session_state.get(na_key, False)
-            has_selections = bool(st.session_state.get(sel_key, []))
-            
-            # Must have either N/A checked OR features selected (but not both, not neither)
-            if not ((is_na and not has_selections) or (not is_na and has_selections)):
-                return False
+    # 2) Condition scores validation - simplified
+    # (cheapest checks first: a few flags, then attributes, then the feature cells)
+    # Property condition must be confirmed OR N/A
+    if not (ss["property_condition_confirmed"] or ss.get("property_condition_na", False)):
+        return False
+    
+    # Quality and improvement must be selected (including N/A)
+    if not ss["condition_scores"]["quality_of_construction"]:
+        return False
+    if not ss["condition_scores"]["improvement_condition"]:
+        return False
 
     # 3) Every attribute must have a selection (including N/A)
-    # Get all complete location chains to check required attributes
-    complete = get_complete_chains()
-    
-    # Find the first location key (since we now have one set of attributes per image)
-    first_location_key = None
-    for chain_idx, chain in enumerate(complete):
-        if not chain:
-            continue
-        
-        # Get the leaf location name for this chain
-        chain_values = list(chain.values()) if isinstance(chain, dict) else list(chain)
-        if not chain_values:
-            continue
-        
-        if chain_values[-1] != "N/A":
-            leaf_location = chain_values[-1]
-        elif len(chain_values) > 1:
-            leaf_location = chain_values[-2]
-        else:
-            leaf_location = None
-        
-        if not leaf_location:
-            continue
-        
-        first_location_key = f"loc_{chain_idx}_{leaf_location}"
-        break
+    # The attribute key, required attributes and feature keys depend only on
+    # the complete chains, so they come precomputed from _validation_plan.
+    first_location_key, required_attrs, feature_pairs = _validation_plan(_complete_paths(_chain_paths()))
     
     if first_location_key:
-        # Collect all relevant attributes across all locations
-        all_relevant_attrs = set()
-        for chain in complete:
-            if not chain:
-                continue
-            
-            # Find relevant attributes for this location
-            for attr, locs in ATTRIBUTE_RULES.items():
-                if any(loc in step for step in chain for loc in locs):
-                    all_relevant_attrs.add(attr)
+        current_attrs = ss["location_attributes"].get(first_location_key, {})
         
         # Check that each relevant attribute has a value (including N/A)
-        for attr in all_relevant_attrs:
-            value = st.session_state.location_attributes.get(first_location_key, {}).get(attr, "")
+        for attr in required_attrs:
+            value = current_attrs.get(attr, "")
             
             # Handle different value types:
             # - Empty string "" = not selected (invalid)
@@ -1441,20 +1494,100 @@ def _can_move_on_uncached() -> bool:
             if value == "":  # Only empty string is invalid
                 return False
 
-    # 4) Condition scores validation - simplified
-    # Property condition must be confirmed OR N/A
-    if not (st.session_state.property_condition_confirmed or st.session_state.get("property_condition_na", False)):
-        return False
-    
-    # Quality and improvement must be selected (including N/A)
-    if not st.session_state.condition_scores["quality_of_construction"]:
-        return False
-    if not st.session_state.condition_scores["improvement_condition"]:
-        return False
+    # 4) Every feature-category must have either N/A checked OR at least one feature selected (but not both)
+    # Deliberately a full pass rather than a dirty set fed by
+    # _mark_feature_dirty: app.py writes na_/sel_ keys directly when loading
+    # and restoring labels, and no widget callback sees those writes.
+    for na_key, sel_key in feature_pairs:
+        # Get current state
+        is_na = ss.get(na_key, False)
+        has_selections = bool(ss.get(sel_key, []))
+        
+        # Must have either N/A checked OR features selected (but not both, not neither)
+        if not ((is_na and not has_selections) or (not is_na and has_selections)):
+            return False
 
     return True
 
 # ====== SAVE LOGIC ======
+@lru_cache(maxsize=8)
+def _label_ordered_feature_keys(leaves: Tuple[str, ...]) -> Tuple[Tuple[str, str, str, str], ...]:
+    """``_feature_keys`` ordered the way the ``"loc:category:feature"`` strings sort.
+
+    Sorting on ``name + ":"`` keeps e.g. ``"Kitchen Island:"`` ahead of
+    ``"Kitchen:"``, matching plain string order of the joined labels.
+    """
+    return tuple(sorted(_feature_keys(leaves), key=lambda row: (row[0] + ":", row[1] + ":")))
+
+
+def _sync_feature_labels() -> List[str]:
+    """Return the sorted ``"loc:category:feature"`` entries for the current image.
+
+    The sorted list lives in ``st.session_state._feature_set`` alongside the
+    per-category state it was built from.  Only categories whose N/A flag or
+    selections changed since the last call are re-formatted and re-inserted,
+    so a save after editing one category doesn't re-sort everything.  A fresh
+    build walks the categories in label order and appends, with no sorting.
+    """
+    ss = st.session_state
+    feature_set: List[str] = ss.get("_feature_set", [])
+    sources: Dict[Tuple[str, str], tuple] = ss.get("_feature_set_src", {})
+    if "_feature_set" not in ss or "_feature_set_src" not in ss:
+        # One half was reset without the other – rebuild from scratch
+        feature_set, sources = [], {}
+    fresh = not sources
+    seen = set()
+
+    for loc, category, na_key, sel_key in _label_ordered_feature_keys(_sorted_leaf_locations()):
+        # Get current state
+        selections = tuple(ss.get(sel_key, []))
+        is_na = ss.get(na_key, False)
+        seen.add((loc, category))
+        prev = sources.get((loc, category))
+        if prev is not None and prev[0] == is_na and prev[1] == selections:
+            continue
+
+        # ------------------------------------------------------------------
+        # Payload logic (mirrors app._build_payload)
+        # ------------------------------------------------------------------
+        if is_na and not selections:
+            # Skip saving anything for this category (stored implicitly as N/A)
+            entries = ()
+        elif not selections and _HAS_NONE[(loc, category)]:
+            # If no selections are made and "None" is available as an option, save "None"
+            entries = (f"{loc}:{category}:None",)
+        else:
+            # Save the actual selections with location and category context
+            entries = tuple(f"{loc}:{category}:{feature}" for feature in sorted(selections))
+
+        if fresh:
+            feature_set.extend(entries)
+        else:
+            for entry in prev[2] if prev is not None else ():
+                del feature_set[bisect_left(feature_set, entry)]
+            for entry in entries:
+                insort(feature_set, entry)
+        sources[(loc, category)] = (is_na, selections, entries)
+
+    # Drop entries for categories whose location is no longer selected
+    for gone in [k for k in sources if k not in seen]:
+        for entry in sources.pop(gone)[2]:
+            del feature_set[bisect_left(feature_set, entry)]
+
+    st.session_state._feature_set = feature_set
+    st.session_state._feature_set_src = sources
+    return feature_set
+
+
+def get_feature_labels() -> List[str]:
+    """Sorted ``"loc:category:feature"`` labels for the current selections.
+
+    Returns a copy of the incrementally maintained list, safe to hand to a
+    payload.
+    """
+    return list(_sync_feature_labels())
+
+
 def save_current_labels(image_paths: List[str], df: pd.DataFrame, user_name: str) -> pd.DataFrame:
     img_path = image_paths[st.session_state.index]
     
@@ -1523,4 +1656,4 @@ def save_current_labels(image_paths: List[str], df: pd.DataFrame, user_name: str
         except Exception:
             pass
     st.success("✅ Labels saved successfully!")
-    return out_df
\ No newline at end of file
+    return out_df
@@ -4,7 +4,16 @@ from typing import Dict, Optional, Protocol
 
 
 class LabelRepo(Protocol):
-    """Storage-agnostic contract used by the Streamlit UI."""
+    """Storage-agnostic contract used by the Streamlit UI.
+
+    This is a static contract only: it is deliberately not
+    ``@runtime_checkable``, and callers never ``isinstance``-check against it.
+    Back-ends subclass it explicitly and the app binds the concrete repo once
+    (``get_repo`` -> ``st.session_state.repo``), so calls made per image or
+    per rerun dispatch straight to the concrete methods.  Keep the method
+    names and the ``*_id`` parameter names stable; the UI passes them by
+    keyword in places.
+    """
 
     # --- task management ---
     def get_next_task(self, user_id: str) -> Optional[Dict]:
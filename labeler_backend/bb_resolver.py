@@ -1,21 +1,181 @@
 from __future__ import annotations
 
+import logging
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Any
+from urllib3.util.retry import Retry
+
+try:  # optional: faster decode straight from the response bytes
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+try:  # optional: HTTP/2 transport (needs httpx with the h2 extra)
+    import h2  # type: ignore  # noqa: F401
+    import httpx  # type: ignore
+except ImportError:
+    httpx = None
 
 # Default endpoint; override via env var if needed.
 ENDPOINT = os.getenv("BB_RESOLVER_ENDPOINT", "https://fetch-image-urls-lmy27ronba-uc.a.run.app/fetch-image-urls")
 
-# Debug: Check what the endpoint value is
-print(f"DEBUG: BB_RESOLVER_ENDPOINT env var: {repr(os.getenv('BB_RESOLVER_ENDPOINT'))}")
-print(f"DEBUG: ENDPOINT value: {repr(ENDPOINT)}")
+logger = logging.getLogger(__name__)
+
+
+# One pooled session for every resolver call, so task transitions reuse the
+# keep-alive connection instead of paying a fresh TCP+TLS handshake each time.
+# The resolver only reads, so retrying its POSTs on gateway errors is safe.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"POST"}),
+            raise_on_status=False,
+        ),
+    ),
+)
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# With httpx[http2] available, overlapping prefetch and interactive resolves
+# share one multiplexed connection instead of queueing on HTTP/1.1 sockets.
+# httpx only retries connection failures, not gateway status codes.  Unlike
+# requests it doesn't follow redirects by default, so turn that on to match.
+_CLIENT = (
+    httpx.Client(
+        follow_redirects=True,
+        transport=httpx.HTTPTransport(
+            http2=True,
+            retries=3,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=8),
+        )
+    )
+    if httpx is not None
+    else None
+)
+
+
+def set_session(session: requests.Session) -> None:
+    """Route resolver calls through *session* (e.g. a mocked one in tests).
+
+    Also drops the httpx client, which would otherwise take precedence.
+    """
+    global _SESSION, _CLIENT
+    _SESSION = session
+    _CLIENT = None
+
+
+def _post(ep: str, payload: dict, timeout: float) -> Any:
+    if orjson is None:
+        if _CLIENT is not None:
+            return _CLIENT.post(ep, json=payload, timeout=timeout)
+        return _SESSION.post(ep, json=payload, timeout=timeout)
+    # Serialize straight to bytes rather than through the stdlib encoder
+    body = orjson.dumps(payload)
+    if _CLIENT is not None:
+        return _CLIENT.post(ep, content=body, headers=_JSON_HEADERS, timeout=timeout)
+    return _SESSION.post(ep, data=body, headers=_JSON_HEADERS, timeout=timeout)
 
 
 class BackblazeResolverError(RuntimeError):
     """Raised when fetching a signed URL fails."""
 
 
+class _DefinitiveResolveError(BackblazeResolverError):
+    """The resolver answered but rejected *bb_url* (4xx, or no usable signed URL)."""
+
+
+# Signed URLs stay valid for far longer than a labeling session revisits an
+# image, so keep recently resolved ones in a small TTL-bounded LRU;
+# (endpoint, bb_url) -> (timestamp, signed URL).
+_URL_CACHE: OrderedDict[tuple[str, str], tuple[float, str]] = OrderedDict()
+_URL_CACHE_MAX = 1024
+_URL_CACHE_TTL = float(os.getenv("BB_URL_CACHE_TTL", "1800"))
+_URL_CACHE_LOCK = threading.Lock()
+
+# Definitive failures (see _DefinitiveResolveError) are remembered briefly so
+# a rerun loop on a bad bb_url doesn't hit the resolver on every pass;
+# (endpoint, bb_url) -> (timestamp, error message).  Transient errors
+# (timeouts, connection errors, 408/429, 5xx) are never cached.
+_FAILED_URLS: OrderedDict[tuple[str, str], tuple[float, str]] = OrderedDict()
+_FAILED_URL_TTL = 60.0
+
+
+# Batches larger than this are split and the shards POSTed concurrently
+# (at most _BATCH_WORKERS at a time, within the session's pool size).
+_BATCH_CHUNK = 50
+_BATCH_WORKERS = 8
+
+# (endpoint, bb_url) -> Future of the resolve currently in flight for it
+_INFLIGHT: dict[tuple[str, str], Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _json_body(r: Any) -> Any:
+    return orjson.loads(r.content) if orjson is not None else r.json()
+
+
+def _cached_url(ep: str, bb_url: str) -> str | None:
+    """Return the signed URL *ep* gave for *bb_url* if it has not expired."""
+    key = (ep, bb_url)
+    with _URL_CACHE_LOCK:
+        hit = _URL_CACHE.get(key)
+        if hit is None:
+            return None
+        if time.monotonic() - hit[0] >= _URL_CACHE_TTL:
+            del _URL_CACHE[key]
+            return None
+        _URL_CACHE.move_to_end(key)
+        return hit[1]
+
+
+def _cached_failure(ep: str, bb_url: str) -> str | None:
+    """Return the error message of a recent definitive failure for *bb_url* on *ep*, if any."""
+    key = (ep, bb_url)
+    with _URL_CACHE_LOCK:
+        hit = _FAILED_URLS.get(key)
+        if hit is None:
+            return None
+        if time.monotonic() - hit[0] >= _FAILED_URL_TTL:
+            del _FAILED_URLS[key]
+            return None
+        return hit[1]
+
+
+def _cache_failure(ep: str, bb_url: str, message: str) -> None:
+    key = (ep, bb_url)
+    with _URL_CACHE_LOCK:
+        _FAILED_URLS[key] = (time.monotonic(), message)
+        _FAILED_URLS.move_to_end(key)
+        while len(_FAILED_URLS) > _URL_CACHE_MAX:
+            _FAILED_URLS.popitem(last=False)
+
+
+def _cache_urls(ep: str, resolved: dict[str, str]) -> None:
+    now = time.monotonic()
+    with _URL_CACHE_LOCK:
+        for bb_url, signed_url in resolved.items():
+            if not signed_url:
+                continue
+            _URL_CACHE[(ep, bb_url)] = (now, signed_url)
+            _URL_CACHE.move_to_end((ep, bb_url))
+        while len(_URL_CACHE) > _URL_CACHE_MAX:
+            _URL_CACHE.popitem(last=False)
+
+
 def resolve_bb_paths_batch(bb_urls: list[str], endpoint: str | None = None) -> dict[str, str]:
     """Resolve multiple bb_urls in a single API call.
     
@@ -29,32 +189,58 @@ def resolve_bb_paths_batch(bb_urls: list[str], endpoint: str | None = None) -> d
     if not bb_urls:
         return {}
     
+    cached: dict[str, str] = {}
+    missing: list[str] = []
+    for bb_url in bb_urls:
+        hit = _cached_url(ep, bb_url)
+        if hit is None:
+            missing.append(bb_url)
+        else:
+            cached[bb_url] = hit
+    if not missing:
+        return cached
+    
     try:
-        print(f"DEBUG: Batch resolving {len(bb_urls)} bb_urls")
-        r = requests.post(ep, json={"row_prefixes": bb_urls}, timeout=15)
-        r.raise_for_status()
-        data: Any = r.json()
-        
-        result = {}
-        if "images" in data and data["images"]:
-            # API returns: {"images": [{"row_prefix": "...", "signed_urls": ["url"]}, ...]}
-            for img in data["images"]:
-                row_prefix = img.get("row_prefix")
-                signed_urls = img.get("signed_urls", [])
-                if row_prefix and signed_urls:
-                    result[row_prefix] = signed_urls[0]
-        elif "signed_urls" in data:
-            # Fallback for old API format: {"signed_urls": {"path": "url", ...}}
-            result = data["signed_urls"]
+        logger.debug("Batch resolving %d bb_urls (%d cached)", len(missing), len(cached))
+        if len(missing) <= _BATCH_CHUNK:
+            result = _resolve_chunk(ep, missing)
         else:
-            raise BackblazeResolverError(f"Unexpected API response structure: {data}")
+            # Large batches: shard and POST the shards concurrently so one
+            # huge request doesn't serialize all the server-side work.
+            chunks = [missing[i:i + _BATCH_CHUNK] for i in range(0, len(missing), _BATCH_CHUNK)]
+            result = {}
+            with ThreadPoolExecutor(max_workers=min(_BATCH_WORKERS, len(chunks))) as pool:
+                for part in pool.map(lambda chunk: _resolve_chunk(ep, chunk), chunks):
+                    result.update(part)
         
-        print(f"DEBUG: Batch resolved {len(result)} URLs")
-        return result
+        logger.debug("Batch resolved %d URLs", len(result))
+        _cache_urls(ep, result)
+        cached.update(result)
+        return cached
     except Exception as exc:  # noqa: BLE001
         raise BackblazeResolverError(f"Batch resolve failed: {exc}") from exc
 
 
+def _resolve_chunk(ep: str, bb_urls: list[str]) -> dict[str, str]:
+    """POST one batch of *bb_urls* and return bb_url -> signed_url."""
+    r = _post(ep, {"row_prefixes": bb_urls}, timeout=15)
+    r.raise_for_status()
+    data: Any = _json_body(r)
+    
+    images = data.get("images")
+    if images:
+        # API returns: {"images": [{"row_prefix": "...", "signed_urls": ["url"]}, ...]}
+        return {
+            img["row_prefix"]: urls[0]
+            for img in images
+            if (urls := img.get("signed_urls")) and img.get("row_prefix")
+        }
+    if "signed_urls" in data:
+        # Fallback for old API format: {"signed_urls": {"path": "url", ...}}
+        return data["signed_urls"]
+    raise BackblazeResolverError(f"Unexpected API response structure: {data}")
+
+
 def resolve_bb_path(bb_url: str, endpoint: str | None = None) -> str:
     """Return a public URL for *bb_url* using the Cloud Run resolver service.
     
@@ -64,17 +250,53 @@ def resolve_bb_path(bb_url: str, endpoint: str | None = None) -> str:
     if not ep:
         raise BackblazeResolverError(f"BB_RESOLVER_ENDPOINT is empty or not set. Please check your environment configuration.")
     
+    cached = _cached_url(ep, bb_url)
+    if cached is not None:
+        return cached
+    failure = _cached_failure(ep, bb_url)
+    if failure is not None:
+        raise BackblazeResolverError(failure)
+    
+    # Single-flight: concurrent reruns asking for the same bb_url wait on the
+    # first caller's request instead of each making their own round trip.
+    key = (ep, bb_url)
+    with _INFLIGHT_LOCK:
+        future = _INFLIGHT.get(key)
+        leader = future is None
+        if leader:
+            future = _INFLIGHT[key] = Future()
+    if not leader:
+        return future.result()
+    
     try:
-        print(f"DEBUG: Resolving bb_url: {bb_url}")
-        print(f"DEBUG: Using endpoint: {ep}")
-        
-        r = requests.post(ep, json={"row_prefixes": [bb_url]}, timeout=10)
-        print(f"DEBUG: API response status: {r.status_code}")
-        print(f"DEBUG: API response text: {r.text}")
+        signed_url = _fetch_bb_path(bb_url, ep)
+    except Exception as exc:
+        if isinstance(exc, _DefinitiveResolveError):
+            _cache_failure(ep, bb_url, str(exc))
+        future.set_exception(exc)
+        raise
+    else:
+        future.set_result(signed_url)
+        return signed_url
+    finally:
+        with _INFLIGHT_LOCK:
+            del _INFLIGHT[key]
+
+
+def _fetch_bb_path(bb_url: str, ep: str) -> str:
+    definitive = False
+    try:
+        logger.debug("Resolving %s via %s", bb_url, ep)
         
+        r = _post(ep, {"row_prefixes": [bb_url]}, timeout=10)
+        # A 4xx is the resolver rejecting this bb_url; a 5xx, timeout (408)
+        # or throttle (429) may clear up
+        definitive = 400 <= r.status_code < 500 and r.status_code not in (408, 429)
         r.raise_for_status()
-        data: Any = r.json()
-        print(f"DEBUG: API response JSON: {data}")
+        data: Any = _json_body(r)
+        # From here on the resolver answered, so a missing or empty URL won't
+        # change on an immediate retry
+        definitive = True
         
         # Fix: Access the correct structure based on actual API response
         if "images" in data and data["images"]:
@@ -86,11 +308,13 @@ def resolve_bb_path(bb_url: str, endpoint: str | None = None) -> str:
         else:
             raise BackblazeResolverError(f"Unexpected API response structure: {data}")
         
-        print(f"DEBUG: Resolved signed_url: {signed_url}")
+        logger.debug("Resolved %s -> %s", bb_url, signed_url)
         
         if not signed_url:
             raise BackblazeResolverError(f"API returned empty signed URL for {bb_url}")
             
+        _cache_urls(ep, {bb_url: signed_url})
         return signed_url
     except Exception as exc:  # noqa: BLE001
-        raise BackblazeResolverError(f"Failed to resolve {bb_url}: {exc}") from exc 
\ No newline at end of file
+        error = _DefinitiveResolveError if definitive else BackblazeResolverError
+        raise error(f"Failed to resolve {bb_url}: {exc}") from exc 
\ No newline at end of file
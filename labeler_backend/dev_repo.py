@@ -1,8 +1,7 @@
 from __future__ import annotations
 
 import os
-from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 
@@ -10,6 +9,7 @@ from .base import LabelRepo
 
 LABEL_CSV_PATH = "labeled_data.csv"
 IMAGE_FOLDER = "images/"
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp")
 
 
 class DevRepo(LabelRepo):
@@ -19,6 +19,10 @@ class DevRepo(LabelRepo):
         assert kind in {"csv", "mock"}
         self.kind = kind
         self._df: pd.DataFrame | None = None
+        self._csv_mtime: int | None = None
+        # image_id (stored as the image_path column) -> row position of its
+        # newest row in self._df; see _index_rows
+        self._idx: Dict[str, int] = {}
         self._mock: Dict[str, Dict] = {}
         self._images = self._discover()
         self._cursor: Dict[str, int] = {}
@@ -28,10 +32,10 @@ class DevRepo(LabelRepo):
         idx = self._cursor.get(user_id, 0)
         if idx >= len(self._images):
             return None
-        path = self._images[idx]
+        path, name = self._images[idx]
         self._cursor[user_id] = idx + 1
         return {
-            "image_id": Path(path).name,
+            "image_id": name,
             "local_path": path,
             "bb_url": path,
             "status": "in_progress",
@@ -46,17 +50,33 @@ class DevRepo(LabelRepo):
         if self.kind == "mock":
             return self._mock.get(image_id)
         df = self._csv()
-        row = df[df["image_path"] == image_id]
-        return row.to_dict("records")[0] if not row.empty else None
+        i = self._idx.get(image_id)
+        return df.iloc[[i]].to_dict("records")[0] if i is not None else None
 
     def save_labels(self, image_id: str, payload: Dict, user_id: str) -> None:
         if self.kind == "mock":
             self._mock[image_id] = payload
             return
         df = self._csv()
-        df = pd.concat([df[df["image_path"] != image_id], pd.DataFrame([payload])], ignore_index=True)
-        df.to_csv(LABEL_CSV_PATH, index=False)
-        self._df = df
+        # Rows are keyed by image_path (the image_id); payloads don't carry it
+        row = pd.DataFrame([{**payload, "image_path": image_id}])
+        # Same schema as the file on disk: append the row instead of rewriting
+        # the whole CSV.  Older rows for this image are dropped on read.
+        append = os.path.exists(LABEL_CSV_PATH) and len(df.columns) > 1 and row.columns.isin(df.columns).all()
+        if append:
+            # Grow the cached frame in place; an older row for this image
+            # stays behind but is shadowed, as in the file itself.
+            row = row.reindex(columns=df.columns)
+            self._idx[image_id] = len(df)
+            df.loc[len(df)] = row.iloc[0]
+            row.to_csv(LABEL_CSV_PATH, mode="a", header=False, index=False)
+        else:
+            df = pd.concat([df, row], ignore_index=True).drop_duplicates("image_path", keep="last", ignore_index=True)
+            df.to_csv(LABEL_CSV_PATH, index=False)
+            self._df = df
+            self._idx = self._index_rows(df)
+        # Our own write shouldn't count as an external change
+        self._csv_mtime = os.stat(LABEL_CSV_PATH).st_mtime_ns
 
     # ---------------- helper ----------------
     def get_image_url(self, image_doc: Dict) -> str:  # type: ignore[override]
@@ -70,8 +90,8 @@ class DevRepo(LabelRepo):
 
     # ---------------- image doc helper ----------------
     def get_image_doc(self, image_id: str) -> Optional[Dict]:  # type: ignore[override]
-        for path in self._images:
-            if Path(path).name == image_id:
+        for path, name in self._images:
+            if name == image_id:
                 return {
                     "image_id": image_id,
                     "local_path": path,
@@ -82,20 +102,39 @@ class DevRepo(LabelRepo):
 
     # ---------------- internals ----------------
     @staticmethod
-    def _discover() -> List[str]:
+    def _discover() -> List[Tuple[str, str]]:
+        """Return sorted ``(path, file name)`` pairs for the images on disk."""
         if not os.path.isdir(IMAGE_FOLDER):
             return []
-        return sorted(
-            str(Path(IMAGE_FOLDER) / f)
-            for f in os.listdir(IMAGE_FOLDER)
-            if f.lower().endswith((".jpg", ".jpeg", ".png", ".webp"))
-        )
+        # DirEntry carries the joined path, name and file type, so no extra
+        # stat/Path per entry
+        with os.scandir(IMAGE_FOLDER) as it:
+            return sorted(
+                (e.path, e.name) for e in it
+                if e.name.lower().endswith(_IMAGE_EXTS) and e.is_file()
+            )
 
     def _csv(self) -> pd.DataFrame:
-        if self._df is not None:
+        # Reload only when the file changed on disk since we last read/wrote it
+        try:
+            mtime: int | None = os.stat(LABEL_CSV_PATH).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._df is not None and mtime == self._csv_mtime:
             return self._df
-        if os.path.exists(LABEL_CSV_PATH):
-            self._df = pd.read_csv(LABEL_CSV_PATH)
+        if mtime is not None:
+            # save_labels appends, so the last row per image wins
+            # Keep image_path as text so reloaded keys match the image_id strings
+            self._df = pd.read_csv(LABEL_CSV_PATH, dtype={"image_path": str}).drop_duplicates("image_path", keep="last", ignore_index=True)
         else:
             self._df = pd.DataFrame(columns=["image_path"])
-        return self._df 
\ No newline at end of file
+        self._csv_mtime = mtime
+        self._idx = self._index_rows(self._df)
+        return self._df
+
+    @staticmethod
+    def _index_rows(df: pd.DataFrame) -> Dict[str, int]:
+        # Same key save_labels indexes appended rows by: the image_id it wrote
+        # into image_path.  Later rows overwrite earlier ones, so each image
+        # maps to its newest row.
+        return {p: i for i, p in enumerate(df["image_path"].tolist())} 
\ No newline at end of file
@@ -2,14 +2,17 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Any
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
 
 # NOTE: we *lazy-import* google cloud libs so that running in dev mode doesn't
 # require the heavy dependency.
 
 from .bb_resolver import resolve_bb_path
 from .dev_repo import DevRepo
-from .base import LabelRepo
+
+if TYPE_CHECKING:  # only used in annotations; never isinstance-checked
+    from .base import LabelRepo
 
 # FireRepo will be imported lazily so Phase-1 can compile before we write it.
 
@@ -17,12 +20,22 @@ from .base import LabelRepo
 def _make_firestore_client():  # type: ignore
     """Return an authenticated Firestore client using either ADC or a blob in env."""
 
+    return _firestore_client(os.getenv("FIRESTORE_CREDENTIALS_JSON"), os.getenv("GCP_PROJECT_ID"))
+
+
+@lru_cache(maxsize=1)
+def _firestore_client(cred_blob: str | None, project_id: str | None):  # type: ignore
+    """Build the client once per credential/project pair and share it.
+
+    The client is thread-safe and holds the gRPC channel, so every session
+    reuses the same connections instead of opening its own.
+    """
+
     # Local import keeps the dependency optional when dev mode is used.
     from google.cloud import firestore  # type: ignore
     from google.oauth2 import service_account  # type: ignore
 
-    cred_blob = os.getenv("FIRESTORE_CREDENTIALS_JSON")
-    project_id = os.getenv("GCP_PROJECT_ID")  # optional – falls back to creds
+    # project_id is optional – falls back to creds
     if cred_blob:
         creds_info: Any = json.loads(cred_blob)
         creds = service_account.Credentials.from_service_account_info(creds_info)
@@ -1,20 +1,103 @@
 from __future__ import annotations
 
 from datetime import timedelta, datetime
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional, TypeVar
+from concurrent.futures import ThreadPoolExecutor
 from random import random
+import threading
 import time
 
 from google.cloud import firestore  # type: ignore
 from google.api_core.exceptions import Aborted  # type: ignore
 
 from .base import LabelRepo
-from .bb_resolver import BackblazeResolverError
+from .bb_resolver import BackblazeResolverError, resolve_bb_path, resolve_bb_paths_batch
+
+T = TypeVar("T")
 
 _LOCK_WINDOW_MINUTES = int(
     __import__("os").getenv("TASK_LOCK_MINUTES", "60")
 )
 
+# Seconds a user's role is trusted by FirestoreRepo._get_role.  The cache is
+# module-level because get_repo builds a new repo on every call;
+# (project, user_id) -> (monotonic time fetched, role).
+_ROLE_CACHE_TTL = 300.0
+_ROLE_CACHE: Dict[tuple[str, str], tuple[float, Optional[str]]] = {}
+
+# How many upcoming unlabeled images to resolve in the background after each
+# task hand-out (0 disables).  One worker is enough: prefetches are
+# best-effort and only need to beat the labeler's think-time.
+_PREFETCH_AHEAD = int(__import__("os").getenv("BB_PREFETCH", "8"))
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bb-prefetch")
+
+
+# Adaptive back-off for transaction retries, per operation and per number of
+# aborts seen so far: a slot grows when waiting that long was followed by
+# another abort and shrinks when the attempt after it commits (slot 0 also
+# shrinks on first-try commits), so the waits track the contention each
+# operation actually sees and decay once it is gone.  Shared across
+# Streamlit sessions (threads), so every read-modify-write goes through
+# _BACKOFF_LOCK.
+_BACKOFF_DEFAULT = (0.05, 0.2, 0.8)
+_BACKOFF_ALPHA = 0.3
+_BACKOFF_MIN, _BACKOFF_MAX = 0.01, 5.0
+_BACKOFF_STATE: Dict[str, list] = {}
+_BACKOFF_LOCK = threading.Lock()
+
+
+def _retry_aborted(op: str, attempt_fn: Callable[[], T], attempts: int = 5) -> T:
+    """Run *attempt_fn* until it doesn't raise ``Aborted``; re-raise after *attempts*.
+
+    With ``max_attempts=1`` the SDK reports a commit-time ``Aborted`` as a
+    ``ValueError`` caused by it, so that counts as an abort too and the
+    ``Aborted`` itself is what gets re-raised.
+    """
+    with _BACKOFF_LOCK:
+        slots = _BACKOFF_STATE.setdefault(op, list(_BACKOFF_DEFAULT))
+    last = len(slots) - 1
+    attempt = 0
+    while True:
+        try:
+            result = attempt_fn()
+        except (Aborted, ValueError) as exc:
+            aborted = exc if isinstance(exc, Aborted) else exc.__cause__
+            if not isinstance(aborted, Aborted):
+                raise
+            attempt += 1
+            if attempt >= attempts:
+                raise aborted from None
+            with _BACKOFF_LOCK:
+                if attempt > 1:
+                    # The previous wait didn't help, so lengthen that slot
+                    waited = min(attempt - 2, last)
+                    slots[waited] = min(slots[waited] * (1 + _BACKOFF_ALPHA), _BACKOFF_MAX)
+                delay = slots[min(attempt - 1, last)]
+            time.sleep(delay * (0.5 + random()))
+            continue
+        # Credit the wait that preceded this commit; a first-try commit
+        # means there is less contention, so it shortens the first wait
+        waited = min(max(attempt - 1, 0), last)
+        with _BACKOFF_LOCK:
+            slots[waited] = max(slots[waited] / (1 + _BACKOFF_ALPHA), _BACKOFF_MIN)
+        return result
+
+
+def _fresh_cached_url(image_doc: Dict) -> Optional[str]:
+    """Return the doc's cached signed URL if it is under 23 hours old."""
+    cached_url = image_doc.get("cached_signed_url")
+    cached_ts = image_doc.get("cached_signed_url_ts")
+    if not (cached_url and cached_ts):
+        return None
+    # Handle Firestore Timestamp objects
+    if hasattr(cached_ts, 'timestamp'):
+        cached_dt = datetime.utcfromtimestamp(cached_ts.timestamp())
+    else:
+        cached_dt = cached_ts
+    if datetime.utcnow() - cached_dt < timedelta(hours=23):
+        return cached_url
+    return None
+
 
 class FirestoreRepo(LabelRepo):
     """Production Firestore backend implementation."""
@@ -31,7 +114,7 @@ class FirestoreRepo(LabelRepo):
     # Internal helper – atomic counter updates on user doc
     # ------------------------------------------------------------------
     def _inc_user(self, txn, user_id: str, **deltas: int) -> None:  # type: ignore[valid-type]
-        """Increment integer counters on the user document inside *txn*."""
+        """Increment integer counters on the user document via *txn* (a transaction or write batch)."""
         if not deltas:
             return
         user_ref = self.users.document(user_id)
@@ -95,6 +178,34 @@ class FirestoreRepo(LabelRepo):
             
             current_property_id = user_data.get("current_property_id")
             
+            # 2a) Try to continue with user's current property first.  Asking
+            # for that property's images directly reads one doc instead of
+            # every labeler contending on the same oldest-unlabeled window.
+            # (Equality filters only, so Firestore serves it from the
+            # single-field indexes; order within a property is not guaranteed.)
+            if current_property_id:
+                own_q = (
+                    self.images.where("status", "==", "unlabeled")
+                    .where("property_id", "==", current_property_id)
+                    .limit(1)
+                )
+                for doc in own_q.stream(transaction=txn):
+                    expires_at = datetime.utcnow() + timedelta(minutes=_LOCK_WINDOW_MINUTES)
+                    txn.update(
+                        doc.reference,
+                        {
+                            "status": "in_progress",
+                            "assigned_to": user_id,
+                            "timestamp_assigned": firestore.SERVER_TIMESTAMP,
+                            "task_expires_at": expires_at,
+                        },
+                    )
+                    data = doc.to_dict()
+                    data.update({"status": "in_progress", "assigned_to": user_id})
+                    return data
+                
+                # No images left in current property, will clear it below
+            
             # Get all candidate unlabeled images upfront (before any writes)
             new_q = (
                 self.images.where("status", "==", "unlabeled")
@@ -103,29 +214,22 @@ class FirestoreRepo(LabelRepo):
             )
             candidate_docs = list(new_q.stream(transaction=txn))
             
-            # 2a) Try to continue with user's current property first
-            if current_property_id:
-                for doc in candidate_docs:
-                    doc_data = doc.to_dict()
-                    if doc_data.get("property_id") == current_property_id:
-                        # Found image in user's current property
-                        expires_at = datetime.utcnow() + timedelta(minutes=_LOCK_WINDOW_MINUTES)
-                        txn.update(
-                            doc.reference,
-                            {
-                                "status": "in_progress",
-                                "assigned_to": user_id,
-                                "timestamp_assigned": firestore.SERVER_TIMESTAMP,
-                                "task_expires_at": expires_at,
-                            },
-                        )
-                        data = doc_data
-                        data.update({"status": "in_progress", "assigned_to": user_id})
-                        return data
-                
-                # No images found in current property, will clear it below
-            
             # 2b) Find new available property
+            # Look up who holds any of the candidate properties up front: one
+            # "in" query per 30 property ids rather than one query per image.
+            candidate_pids = list({
+                pid
+                for pid in (doc.to_dict().get("property_id") for doc in candidate_docs)
+                if pid and pid != current_property_id
+            })
+            taken_by_other: set = set()
+            for i in range(0, len(candidate_pids), 30):
+                holders_q = self.users.where("current_property_id", "in", candidate_pids[i:i + 30])
+                for u in holders_q.stream(transaction=txn):
+                    # Allow the same user to continue on their property; skip only if taken by someone else
+                    if u.id != user_id:
+                        taken_by_other.add(u.to_dict().get("current_property_id"))
+
             for doc in candidate_docs:
                 doc_data = doc.to_dict()
                 candidate_property_id = doc_data.get("property_id")
@@ -137,15 +241,7 @@ class FirestoreRepo(LabelRepo):
                 if candidate_property_id == current_property_id:
                     continue  # Already checked above
                 
-                # Check if property is already taken by another user
-                property_taken_q = (
-                    self.users.where("current_property_id", "==", candidate_property_id)
-                    .limit(1)
-                )
-                existing_users = list(property_taken_q.stream(transaction=txn))
-                # Allow the same user to continue on their property; skip only if taken by someone else
-                taken_by_other = any(u.id != user_id for u in existing_users)
-                if taken_by_other:
+                if candidate_property_id in taken_by_other:
                     continue  # Property taken by another user, try next image
                 
                 # Property is available! Claim it
@@ -175,15 +271,43 @@ class FirestoreRepo(LabelRepo):
             
             return None
 
-        for attempt in range(5):
-            try:
-                return _txn(self.db.transaction())
-            except Aborted:
-                # exponential back-off with jitter
-                time.sleep((2 ** attempt) * 0.1 * (1 + random()))
-                continue
-        # all attempts failed
-        raise RuntimeError("Unable to acquire task due to repeated transaction aborts")
+        try:
+            task = _retry_aborted("get_next_task", lambda: _txn(self.db.transaction(max_attempts=1)))
+        except Aborted as exc:
+            # all attempts failed
+            raise RuntimeError("Unable to acquire task due to repeated transaction aborts") from exc
+        if task and _PREFETCH_AHEAD:
+            # The task's property is the one get_next_task continues with next
+            _PREFETCH_POOL.submit(self._prefetch_upcoming_urls, task.get("property_id"))
+        return task
+
+    def _peek_unlabeled(self, n: int, property_id: Optional[str] = None) -> list[Dict]:
+        """Return up to *n* unlabeled image docs without locking them.
+
+        With *property_id*, the same filter get_next_task uses to continue a
+        property; otherwise the globally oldest uploads.
+        """
+        q = self.images.where("status", "==", "unlabeled")
+        if property_id:
+            q = q.where("property_id", "==", property_id)
+        else:
+            q = q.order_by("timestamp_uploaded")
+        return [doc.to_dict() for doc in q.limit(n).stream()]
+
+    def _prefetch_upcoming_urls(self, property_id: Optional[str] = None) -> None:
+        """Warm the resolver's URL cache for the images likely to be handed out next."""
+        # Only the default resolver reads from the cache this fills
+        if self._resolve is not resolve_bb_path:
+            return
+        try:
+            bb_urls = [
+                d["bb_url"]
+                for d in self._peek_unlabeled(_PREFETCH_AHEAD, property_id)
+                if d.get("bb_url") and not _fresh_cached_url(d)
+            ]
+            resolve_bb_paths_batch(bb_urls)
+        except Exception as e:
+            print(f"[PREFETCH] Background URL prefetch failed: {e}")
 
     def release_task(self, image_id: str, user_id: str, *, abandon: bool = False) -> None:  # noqa: D401
         if abandon:
@@ -222,9 +346,8 @@ class FirestoreRepo(LabelRepo):
             img_data = img_snap.to_dict() if img_snap.exists else {}
             is_confirmed = img_data.get("qa_status") == "confirmed"
 
-            # Determine if caller is admin (role look-up is cheap and cached)
-            user_snap = self.users.document(user_id).get(transaction=txn)
-            is_admin_user = user_snap.exists and user_snap.to_dict().get("role") == "admin"
+            # Determine if caller is admin (cached outside the transaction)
+            is_admin_user = self._get_role(user_id) == "admin"
 
             if is_confirmed and not is_admin_user:
                 raise PermissionError("Image has been confirmed by QA and can no longer be edited by labelers.")
@@ -263,31 +386,55 @@ class FirestoreRepo(LabelRepo):
             # We NO LONGER clear qa_feedback so reviewers can see past remarks
             txn.update(img_ref, update_fields)
 
-            # 2b) Update per-user counters: increment only for newly labeled images
-            # Increment counters the first time a labels document is created (snap.exists == False)
-            if not snap.exists:
-                print(f"[COUNTER DEBUG] First-time label for {image_id} by {user_id} -> increment counters")
-                self._inc_user(txn, user_id,
-                               images_to_review=1,
-                               images_processed=1)
-            else:
-                print(f"[COUNTER DEBUG] Subsequent edit for {image_id} by {user_id} -> no counter change")
-
-            # 3) user stats (unchanged) ---------------------------------------
-            user_ref = self.users.document(user_id)
-            txn.set(user_ref, {}, merge=True)
-            txn.update(
-                user_ref,
-                {
-                    "last_labeled_image_id": image_id,
-                    "timestamp_last_labeled": firestore.SERVER_TIMESTAMP,
-                },
-            )
+            # Tell the caller whether this created the labels document
+            return not snap.exists
 
         print(f"[FIRESTORE DEBUG] Starting transaction for image {image_id}")
-        _txn(self.db.transaction())
+        first_time = _retry_aborted("save_labels", lambda: _txn(self.db.transaction(max_attempts=1)))
         print(f"[FIRESTORE DEBUG] Transaction completed for image {image_id}")
 
+        # Counters and user stats are increments / last-writer-wins fields, so
+        # they go in a batch after the commit instead of holding the user doc
+        # inside the transaction.  (admin_tools/recount_counters.py can
+        # rebuild the counters should this batch ever fail.)
+        batch = self.db.batch()
+        # 2b) Update per-user counters: increment only for newly labeled images
+        if first_time:
+            print(f"[COUNTER DEBUG] First-time label for {image_id} by {user_id} -> increment counters")
+            self._inc_user(batch, user_id,
+                           images_to_review=1,
+                           images_processed=1)
+        else:
+            print(f"[COUNTER DEBUG] Subsequent edit for {image_id} by {user_id} -> no counter change")
+
+        # 3) user stats (unchanged) ---------------------------------------
+        user_ref = self.users.document(user_id)
+        batch.set(user_ref, {}, merge=True)
+        batch.update(
+            user_ref,
+            {
+                "last_labeled_image_id": image_id,
+                "timestamp_last_labeled": firestore.SERVER_TIMESTAMP,
+            },
+        )
+        batch.commit()
+
+    def _get_role(self, user_id: str) -> Optional[str]:
+        """Return *user_id*'s role, re-read at most every few minutes.
+
+        Roles almost never change, so this keeps the user doc out of the
+        save_labels transaction's read set.
+        """
+        key = (self.db.project, user_id)
+        hit = _ROLE_CACHE.get(key)
+        now = time.monotonic()
+        if hit is not None and now - hit[0] < _ROLE_CACHE_TTL:
+            return hit[1]
+        snap = self.users.document(user_id).get()
+        role = (snap.to_dict() or {}).get("role") if snap.exists else None
+        _ROLE_CACHE[key] = (now, role)
+        return role
+
     # ------------------------------------------------------------------
     # Helper
     # ------------------------------------------------------------------
@@ -306,24 +453,11 @@ class FirestoreRepo(LabelRepo):
                 f"bb_url value: {repr(bb_url)}"
             )
         
-        # Check if we have a fresh cached signed URL (24-hour TTL)
-        cached_url = image_doc.get("cached_signed_url")
-        cached_ts = image_doc.get("cached_signed_url_ts")
-        
-        if cached_url and cached_ts:
-            # Check if cached URL is still fresh (within 23 hours to be safe)
-            from datetime import datetime, timedelta
-            now = datetime.utcnow()
-            # Handle Firestore Timestamp objects
-            if hasattr(cached_ts, 'timestamp'):
-                cached_dt = datetime.utcfromtimestamp(cached_ts.timestamp())
-            else:
-                cached_dt = cached_ts
-            
-            age = now - cached_dt
-            if age < timedelta(hours=23):
-                print(f"[CACHE] Using cached signed URL for {image_id} (age: {age})")
-                return cached_url
+        # Check if we have a fresh cached signed URL (24-hour TTL, 23 to be safe)
+        cached_url = _fresh_cached_url(image_doc)
+        if cached_url:
+            print(f"[CACHE] Using cached signed URL for {image_id}")
+            return cached_url
         
         # Cache miss or expired - resolve and store
         # If resolver fails, exception will be caught by caller for fallback to image_url
@@ -422,7 +556,7 @@ class FirestoreRepo(LabelRepo):
                     images_to_review=-1,
                 )
 
-        _txn(self.db.transaction())
+        _retry_aborted("confirm_labels", lambda: _txn(self.db.transaction(max_attempts=1)))
 
     def request_revision(self, image_id: str, labeler_id: str, admin_id: str, feedback: str | None = "") -> None:  # noqa: D401
         """Send *image_id* back for revision to *labeler_id* with optional feedback."""
@@ -436,26 +570,74 @@ class FirestoreRepo(LabelRepo):
             }
         )
 
+    def _labels_newest_first(self, labeler_id: str):
+        return self.labels.where("labeled_by", "==", labeler_id).order_by(
+            "timestamp_created", direction=firestore.Query.DESCENDING
+        )
+
+    def _label_anchor(self, labeler_id: str, image_id: str):
+        """Return the label snapshot for *image_id* to page from, or None if it
+        isn't one of *labeler_id*'s labels."""
+        snap = self.labels.document(image_id).get()
+        if not snap.exists or (snap.to_dict() or {}).get("labeled_by") != labeler_id:
+            return None
+        return snap
+
+    def _iter_label_images(self, q, batch: int = 20):
+        """Yield ``(image_id, image_doc)`` for the labels streamed by *q*, in order.
+
+        Image docs are fetched *batch* at a time with one ``get_all`` round
+        trip instead of one ``get()`` per label; labels whose image doc is
+        missing are skipped.
+        """
+        ids: list[str] = []
+        for lbl_snap in q.stream():
+            ids.append(lbl_snap.id)
+            if len(ids) == batch:
+                yield from self._get_image_docs(ids)
+                ids = []
+        if ids:
+            yield from self._get_image_docs(ids)
+
+    def _iter_label_images_newer(self, labeler_id: str, anchor, page: int = 20):
+        """Yield ``(image_id, image_doc)`` for *labeler_id*'s labels newer than
+        *anchor*, nearest first, up to 2000 labels.
+
+        Pages backwards over the descending query with ``limit_to_last``, so
+        no ascending index is needed and the caller can stop at the first hit.
+        """
+        q = self._labels_newest_first(labeler_id)
+        cursor = anchor
+        for _ in range(2000 // page):
+            # limit_to_last queries can't be streamed; get() keeps query order
+            snaps = q.end_before(cursor).limit_to_last(page).get()
+            if not snaps:
+                return
+            yield from self._get_image_docs([snap.id for snap in reversed(snaps)])
+            if len(snaps) < page:
+                return
+            cursor = snaps[0]
+
+    def _get_image_docs(self, ids: list[str]):
+        # get_all returns snapshots in no particular order
+        snaps = {snap.id: snap for snap in self.db.get_all([self.images.document(i) for i in ids])}
+        for img_id in ids:
+            snap = snaps.get(img_id)
+            if snap is not None and snap.exists:
+                yield img_id, snap.to_dict() or {}
+
     def get_next_review_task(self, labeler_id: str, after_image_id: str = None) -> Optional[Dict]:  # noqa: D401
         """Return the next (older) labeled image by *labeler_id* awaiting QA (qa_status == 'pending').
         If after_image_id is given, return the next older image after that one.
         """
-        q = (
-            self.labels.where("labeled_by", "==", labeler_id)
-            .order_by("timestamp_created", direction=firestore.Query.DESCENDING)
-            .limit(2000)
-        )
-        found = after_image_id is None
-        for lbl_snap in q.stream():
-            img_id = lbl_snap.id
-            if not found:
-                if img_id == after_image_id:
-                    found = True
-                continue
-            img_snap = self.images.document(img_id).get()
-            if not img_snap.exists:
-                continue
-            img_doc = img_snap.to_dict() or {}
+        q = self._labels_newest_first(labeler_id)
+        if after_image_id is not None:
+            anchor = self._label_anchor(labeler_id, after_image_id)
+            if anchor is None:
+                return None
+            # Resume right after the anchor instead of streaming up to it
+            q = q.start_after(anchor)
+        for img_id, img_doc in self._iter_label_images(q.limit(2000)):
             if img_doc.get("qa_status") == "pending":
                 img_doc.update({"image_id": img_id})
                 return img_doc
@@ -465,66 +647,38 @@ class FirestoreRepo(LabelRepo):
         """Return the previous (newer) labeled image by *labeler_id* awaiting QA (qa_status == 'pending').
         If before_image_id is given, return the next newer image before that one.
         """
-        q = (
-            self.labels.where("labeled_by", "==", labeler_id)
-            .order_by("timestamp_created", direction=firestore.Query.DESCENDING)
-            .limit(2000)
-        )
-        prev = None
-        for lbl_snap in q.stream():
-            img_id = lbl_snap.id
-            if img_id == before_image_id:
-                return prev
-            img_snap = self.images.document(img_id).get()
-            if not img_snap.exists:
-                continue
-            img_doc = img_snap.to_dict() or {}
+        anchor = self._label_anchor(labeler_id, before_image_id)
+        if anchor is None:
+            return None
+        for img_id, img_doc in self._iter_label_images_newer(labeler_id, anchor):
             if img_doc.get("qa_status") == "pending":
-                prev = img_doc.copy()
-                prev["image_id"] = img_id
-        return None 
+                img_doc.update({"image_id": img_id})
+                return img_doc
+        return None
 
     # ------------------------------------------------------------------
     # QA editor navigation (pending or review; exclude confirmed)
     # ------------------------------------------------------------------
     def get_next_editor_task(self, labeler_id: str, after_image_id: str | None = None) -> Optional[Dict]:  # noqa: D401
-        q = (
-            self.labels.where("labeled_by", "==", labeler_id)
-            .order_by("timestamp_created", direction=firestore.Query.DESCENDING)
-            .limit(2000)
-        )
-        found = after_image_id is None
-        for lbl_snap in q.stream():
-            img_id = lbl_snap.id
-            if not found:
-                if img_id == after_image_id:
-                    found = True
-                continue
-            img_snap = self.images.document(img_id).get()
-            if not img_snap.exists:
-                continue
-            img_doc = img_snap.to_dict() or {}
+        q = self._labels_newest_first(labeler_id)
+        if after_image_id is not None:
+            anchor = self._label_anchor(labeler_id, after_image_id)
+            if anchor is None:
+                return None
+            # Resume right after the anchor instead of streaming up to it
+            q = q.start_after(anchor)
+        for img_id, img_doc in self._iter_label_images(q.limit(2000)):
             if img_doc.get("qa_status") in ("pending", "review"):
                 img_doc.update({"image_id": img_id})
                 return img_doc
         return None
 
     def get_prev_editor_task(self, labeler_id: str, before_image_id: str) -> Optional[Dict]:  # noqa: D401
-        q = (
-            self.labels.where("labeled_by", "==", labeler_id)
-            .order_by("timestamp_created", direction=firestore.Query.DESCENDING)
-            .limit(2000)
-        )
-        prev = None
-        for lbl_snap in q.stream():
-            img_id = lbl_snap.id
-            if img_id == before_image_id:
-                return prev
-            img_snap = self.images.document(img_id).get()
-            if not img_snap.exists:
-                continue
-            img_doc = img_snap.to_dict() or {}
+        anchor = self._label_anchor(labeler_id, before_image_id)
+        if anchor is None:
+            return None
+        for img_id, img_doc in self._iter_label_images_newer(labeler_id, anchor):
             if img_doc.get("qa_status") in ("pending", "review"):
-                prev = img_doc.copy()
-                prev["image_id"] = img_id
+                img_doc.update({"image_id": img_id})
+                return img_doc
         return None
\ No newline at end of file
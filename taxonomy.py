@@ -1305,6 +1305,12 @@ ATTRIBUTE_RULES = {
     "kitchen_has_island": ["Kitchen"],  # Only when Kitchen is selected
 }
 
+# Inverse of ATTRIBUTE_RULES - which attributes a location name enables
+LOC_TO_ATTRS = {}
+for _attr, _locs in ATTRIBUTE_RULES.items():
+    for _loc in _locs:
+        LOC_TO_ATTRS[_loc] = LOC_TO_ATTRS.get(_loc, frozenset()) | {_attr}
+
 # --------------------------------------------------------------------------- #
 # Standardize common feature option lists across all locations                #
 # --------------------------------------------------------------------------- #
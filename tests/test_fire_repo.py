@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("google.cloud.firestore")
+
+from labeler_backend import fire_repo  # noqa: E402
+
+
+class _Aborted(Exception):
+    pass
+
+
+@pytest.fixture
+def backoff(monkeypatch):
+    monkeypatch.setattr(fire_repo, "Aborted", _Aborted)
+    monkeypatch.setattr(fire_repo.time, "sleep", lambda _s: None)
+    monkeypatch.setattr(fire_repo, "random", lambda: 0.5)
+    monkeypatch.setattr(fire_repo, "_BACKOFF_STATE", {})
+    return fire_repo._BACKOFF_STATE
+
+
+def _run(aborts: int, wrapped: bool = False):
+    left = [aborts]
+
+    def attempt():
+        if left[0]:
+            left[0] -= 1
+            if wrapped:
+                raise ValueError("Failed to commit transaction in 1 attempts") from _Aborted()
+            raise _Aborted()
+        return "ok"
+
+    return fire_repo._retry_aborted("op", attempt)
+
+
+def test_backoff_slots_recover_after_contention(backoff):
+    for _ in range(50):
+        assert _run(3) == "ok"
+    assert backoff["op"][0] > fire_repo._BACKOFF_DEFAULT[0]
+
+    for _ in range(300):
+        _run(0)
+    assert backoff["op"][0] == fire_repo._BACKOFF_MIN
+
+
+def test_commit_on_first_try_only_shrinks(backoff):
+    _run(0)
+    slots = backoff["op"]
+    assert slots[0] < fire_repo._BACKOFF_DEFAULT[0]
+    assert slots[1:] == list(fire_repo._BACKOFF_DEFAULT[1:])
+
+
+def test_wrapped_commit_abort_is_retried_then_reraised(backoff):
+    assert _run(2, wrapped=True) == "ok"
+    with pytest.raises(_Aborted):
+        _run(5, wrapped=True)
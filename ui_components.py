@@ -23,6 +23,10 @@ chains_to_label_strings = _ui.chains_to_label_strings  # type: ignore[attr-defin
 get_leaf_locations = _ui.get_leaf_locations  # type: ignore[attr-defined]
 label_strings_to_chains = _ui.label_strings_to_chains  # type: ignore[attr-defined]
 get_complete_chains = _ui.get_complete_chains  # type: ignore[attr-defined]
+chain_leaf_location = _ui.chain_leaf_location  # type: ignore[attr-defined]
+get_relevant_attributes = _ui.get_relevant_attributes  # type: ignore[attr-defined]
+get_feature_labels = _ui.get_feature_labels  # type: ignore[attr-defined]
+parse_location_key = _ui.parse_location_key  # type: ignore[attr-defined]
 
 # State restoration functions
 restore_attribute_state = _ui.restore_attribute_state  # type: ignore[attr-defined]
@@ -31,4 +35,5 @@ restore_condition_state = _ui.restore_condition_state  # type: ignore[attr-defin
 # Taxonomies
 LOCATION_TAXONOMY = _ui.LOCATION_TAXONOMY  # type: ignore[attr-defined]
 FEATURE_TAXONOMY = _ui.FEATURE_TAXONOMY  # type: ignore[attr-defined]
+FEATURE_KEYS = _ui.FEATURE_KEYS  # type: ignore[attr-defined]
 ATTRIBUTE_RULES = _ui.ATTRIBUTE_RULES  # type: ignore[attr-defined] 
\ No newline at end of file